@@ -0,0 +1,90 @@
+import math
+import numpy as np
+
+class MaxIndex(object):
+    """ segment tree over k action values: argmax in O(1), update of one value in O(log k)
+        (ties go to the lowest index, same choice as np.argmax) """
+
+    def __init__(self, values):
+        self.k = len(values)
+        self.size = 1 << max(self.k-1, 0).bit_length()     # number of leaves (power of 2)
+        padded = np.full(self.size, -np.inf)
+        padded[:self.k] = values
+        self.values = padded.tolist()
+        # winner of each node, built level by level with vectorized comparisons
+        winners = np.arange(self.size)
+        self.winners = [0]*self.size + winners.tolist()
+        while len(winners) > 1:
+            left, right = winners[0::2], winners[1::2]
+            winners = np.where(padded[left] >= padded[right], left, right)
+            start = len(winners)
+            self.winners[start:2*start] = winners.tolist()
+
+    def argmax(self):
+        return self.winners[1]
+
+    def update(self, i, value):
+        """ set value of action i and repair its path to the root """
+        values, winners = self.values, self.winners
+        values[i] = value
+        node = (i+self.size) >> 1
+        while node:
+            left, right = winners[2*node], winners[2*node+1]
+            winners[node] = left if values[left] >= values[right] else right
+            node >>= 1
+
+class UCBIndex(object):
+    """ kinetic segment tree over the UCB bounds Q(a) + c*sqrt(log(t+1)/(N(a)+0.01)):
+        each node keeps its winner and the first step at which that winner may change,
+        so a query only re-evaluates expired nodes and a pull only invalidates one path """
+
+    def __init__(self, k, c, initial_value=0.0):
+        self.k = k
+        self.c = c
+        self.size = 1 << max(k-1, 0).bit_length()           # number of leaves (power of 2)
+        self.q_evals = [float(initial_value)]*k              # Q(a)
+        self.times = [0.0]*k                                 # N(a)
+        self.winners = [0]*self.size + list(range(self.size))
+        self.expires = [-1]*self.size + [math.inf]*self.size  # step at which each node must be recomputed
+
+    def bound(self, a, log_t):
+        """ UCB of action a, same floating-point operations as the vectorized expression """
+        return self.q_evals[a]+self.c*math.sqrt(log_t/(self.times[a]+0.01))
+
+    def overtake_step(self, winner, loser, t, log_t):
+        """ first step after t at which loser may catch up with winner (conservative) """
+        # bound(a) = Q(a) + c*w(a)*g with g = sqrt(log(t+1)), w(a) = 1/sqrt(N(a)+0.01): lines in g
+        slope_gap = self.c*(1/math.sqrt(self.times[loser]+0.01)-1/math.sqrt(self.times[winner]+0.01))
+        if slope_gap <= 0: return math.inf
+        value_gap = self.q_evals[winner]-self.q_evals[loser]
+        value_gap -= 1e-9*(abs(self.q_evals[winner])+abs(self.q_evals[loser])+1)   # margin for rounding
+        g = value_gap/slope_gap
+        if g <= 0 or g*g >= 700: return t+1 if g <= 0 else math.inf
+        return max(t+1, math.floor((math.exp(g*g)-1)*(1-1e-9))-1)
+
+    def refresh(self, node, t, log_t):
+        """ recompute winners of expired nodes under node at step t """
+        if node >= self.size or self.expires[node] > t: return
+        left, right = 2*node, 2*node+1
+        self.refresh(left, t, log_t)
+        self.refresh(right, t, log_t)
+        l, r = self.winners[left], self.winners[right]
+        if r >= self.k: winner, expire = l, math.inf
+        elif self.bound(l, log_t) >= self.bound(r, log_t): winner, expire = l, self.overtake_step(l, r, t, log_t)
+        else: winner, expire = r, self.overtake_step(r, l, t, log_t)
+        self.winners[node] = winner
+        self.expires[node] = min(expire, self.expires[left], self.expires[right])
+
+    def argmax(self, t):
+        """ action with the largest bound at step t (lowest index on ties, same as np.argmax) """
+        self.refresh(1, t, float(np.log(t+1)))
+        return self.winners[1]
+
+    def update(self, a, q_eval, times):
+        """ set Q(a), N(a) after a pull and invalidate the path of a """
+        self.q_evals[a] = q_eval
+        self.times[a] = times
+        node = (a+self.size) >> 1
+        while node:
+            self.expires[node] = -1
+            node >>= 1
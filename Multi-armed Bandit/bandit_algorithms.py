@@ -1,50 +1,163 @@
-from tqdm import tqdm
 import numpy as np
 
-def epsilon_greedy(env, epsilon=0.1, initial_value=0.0, steps=1000):
-    """ solve env with ε-greedy (sample-average) algorithm """
+from arm_index import MaxIndex, UCBIndex
+
+# every algorithm takes an optional `timer` (benchmark.PhaseTimer) that times its select / env / update phases
+
+def epsilon_greedy(env, epsilon=0.1, initial_value=0.0, steps=1000, rng=None, indexed=False, timer=None):
+    """ solve env with ε-greedy (sample-average) algorithm (rng: BlockRNG, env.rng if None;
+        indexed: O(log k) greedy selection with a segment tree over Q, same choices, for very large k) """
+    rng = env.rng if rng is None else rng
     k_q_evals = np.full(env.k, initial_value, dtype=np.float64)         # initial values of Q(a)
     k_times = np.zeros(env.k)                                           # selected times of each a
+    index = MaxIndex(k_q_evals) if indexed else None
 
-    rewards = []
+    rewards = np.zeros(steps)
+    if timer is not None: timer.start()
     for t in range(steps):
         # random selection
-        if np.random.rand() < epsilon: a = np.random.randint(env.k)
+        if epsilon > 0 and rng.random() < epsilon: a = rng.integers(env.k)
         # greedy selection
-        else: a = np.argmax(k_q_evals)
+        else: a = k_q_evals.argmax() if index is None else index.argmax()
+        if timer is not None: timer.lap('select')
 
         cur_reward = env.step(a)
+        if timer is not None: timer.lap('env')
         k_times[a] += 1
         k_q_evals[a] += (cur_reward-k_q_evals[a])/k_times[a]            # update Q(a)
-        rewards.append(cur_reward)
+        if index is not None: index.update(a, k_q_evals[a])
+        rewards[t] = cur_reward
+        if timer is not None: timer.lap('update')
     return rewards
 
-def upper_confidence_bound(env, c=1, steps=1000):
-    """ solve env with Upper-Confidence-Bound action selection """
+def upper_confidence_bound(env, c=1, steps=1000, indexed=False, timer=None):
+    """ solve env with Upper-Confidence-Bound action selection
+        (indexed: kinetic segment tree over the bounds with lazy refresh, same choices, for very large k) """
     k_q_evals = np.zeros(env.k, dtype=np.float64)                       # initial values of Q(a)
     k_times = np.zeros(env.k)                                           # selected times of each a
+    index = UCBIndex(env.k, c) if indexed else None
 
-    rewards = []
+    rewards = np.zeros(steps)
+    if timer is not None: timer.start()
     for t in range(steps):
-        a = np.argmax(k_q_evals+c*np.sqrt(np.log(t+1)/(k_times+0.01)))  # action value + uncertainty
+        if index is None: a = (k_q_evals+c*np.sqrt(np.log(t+1)/(k_times+0.01))).argmax()  # action value + uncertainty
+        else: a = index.argmax(t)
+        if timer is not None: timer.lap('select')
         cur_reward = env.step(a)
+        if timer is not None: timer.lap('env')
         k_times[a] += 1
         k_q_evals[a] += (cur_reward-k_q_evals[a])/k_times[a]            # update Q(a)
-        rewards.append(cur_reward)
+        if index is not None: index.update(a, k_q_evals[a], k_times[a])
+        rewards[t] = cur_reward
+        if timer is not None: timer.lap('update')
     return rewards
 
-def gradient_bandit(env, alpha=0.1, steps=1000):
-    """ solve env with gradient bandit algorithm """
+def gradient_bandit(env, alpha=0.1, steps=1000, baseline_step=None, rng=None, timer=None):
+    """ solve env with gradient bandit algorithm
+        (baseline: average of past rewards, or exponential recency-weighted average with step size baseline_step;
+         rng: BlockRNG, env.rng if None) """
+    rng = env.rng if rng is None else rng
     k_prefers = np.zeros(env.k, dtype=np.float64)                       # initial numerical preference of actions
 
-    rewards = []
+    rewards = np.zeros(steps)
+    average_reward = 0.0                                                # baseline, updated incrementally
+    if timer is not None: timer.start()
     for t in range(steps):
-        exp_prefers = np.exp(k_prefers)
-        probs = exp_prefers/np.sum(exp_prefers)                         # action probabilities
-        a = np.random.choice(np.arange(env.k), p=probs)                   # action choice
+        exp_prefers = np.exp(k_prefers-k_prefers.max())                 # numerically stable softmax
+        probs = exp_prefers/exp_prefers.sum()                           # action probabilities
+        a = min(probs.cumsum().searchsorted(rng.random()), env.k-1)     # action choice (inverse CDF)
+        if timer is not None: timer.lap('select')
 
         cur_reward = env.step(a)
-        average_reward = cur_reward if len(rewards) == 0 else np.mean(rewards)
-        k_prefers += np.array([alpha*(cur_reward-average_reward)*(int(i==a)-probs[i]) for i in range(env.k)])
-        rewards.append(cur_reward)
-    return rewards
\ No newline at end of file
+        if timer is not None: timer.lap('env')
+        if t == 0: average_reward = cur_reward
+        step_size = alpha*(cur_reward-average_reward)
+        k_prefers -= step_size*probs                                    # H(b) -= α(R-baseline)π(b) for all b
+        k_prefers[a] += step_size                                       # H(a) += α(R-baseline) for chosen a
+        # update baseline
+        if baseline_step is None: average_reward += (cur_reward-average_reward)/(t+1)
+        else: average_reward += baseline_step*(cur_reward-average_reward)
+        rewards[t] = cur_reward
+        if timer is not None: timer.lap('update')
+    return rewards
+
+def batch_epsilon_greedy(env, epsilon=0.1, initial_value=0.0, steps=1000, rng=None, stats=None, timer=None):
+    """ solve batched env with ε-greedy (sample-average) algorithm, all runs in one vectorized step
+        (returns (n_runs, steps) rewards, or feeds a RewardStats `stats` and returns it) """
+    rng = env.rng if rng is None else rng
+    runs = env.runs
+    k_q_evals = np.full((env.n_runs, env.k), initial_value, dtype=np.float64)  # initial values of Q(a) per run
+    k_times = np.zeros((env.n_runs, env.k))                                     # selected times of each a per run
+
+    rewards = None if stats is not None else np.empty((env.n_runs, steps))
+    if timer is not None: timer.start()
+    for t in range(steps):
+        # greedy selection
+        actions = np.argmax(k_q_evals, axis=1)
+        # random selection
+        if epsilon > 0:
+            explore = rng.random(env.n_runs) < epsilon
+            actions[explore] = rng.integers(env.k, size=np.count_nonzero(explore))
+        if timer is not None: timer.lap('select')
+
+        cur_rewards = env.step(actions)
+        if timer is not None: timer.lap('env')
+        k_times[runs, actions] += 1
+        k_q_evals[runs, actions] += (cur_rewards-k_q_evals[runs, actions])/k_times[runs, actions]  # update Q(a)
+        if stats is not None: stats.add_step(t, cur_rewards, actions == env.optimal_actions)
+        else: rewards[:, t] = cur_rewards
+        if timer is not None: timer.lap('update')
+    return rewards if stats is None else stats
+
+def batch_upper_confidence_bound(env, c=1, steps=1000, rng=None, stats=None, timer=None):
+    """ solve batched env with Upper-Confidence-Bound action selection, all runs in one vectorized step
+        (returns (n_runs, steps) rewards, or feeds a RewardStats `stats` and returns it) """
+    runs = env.runs
+    k_q_evals = np.zeros((env.n_runs, env.k), dtype=np.float64)     # initial values of Q(a) per run
+    k_times = np.zeros((env.n_runs, env.k))                         # selected times of each a per run
+
+    rewards = None if stats is not None else np.empty((env.n_runs, steps))
+    if timer is not None: timer.start()
+    for t in range(steps):
+        actions = np.argmax(k_q_evals+c*np.sqrt(np.log(t+1)/(k_times+0.01)), axis=1)  # action value + uncertainty
+        if timer is not None: timer.lap('select')
+        cur_rewards = env.step(actions)
+        if timer is not None: timer.lap('env')
+        k_times[runs, actions] += 1
+        k_q_evals[runs, actions] += (cur_rewards-k_q_evals[runs, actions])/k_times[runs, actions]  # update Q(a)
+        if stats is not None: stats.add_step(t, cur_rewards, actions == env.optimal_actions)
+        else: rewards[:, t] = cur_rewards
+        if timer is not None: timer.lap('update')
+    return rewards if stats is None else stats
+
+def batch_gradient_bandit(env, alpha=0.1, steps=1000, baseline_step=None, rng=None, stats=None, timer=None):
+    """ solve batched env with gradient bandit algorithm, all runs in one vectorized step
+        (returns (n_runs, steps) rewards, or feeds a RewardStats `stats` and returns it;
+         baseline: average of past rewards, or exponential recency-weighted average with step size baseline_step) """
+    rng = env.rng if rng is None else rng
+    runs = env.runs
+    k_prefers = np.zeros((env.n_runs, env.k), dtype=np.float64)     # initial numerical preference of actions per run
+    average_rewards = np.zeros(env.n_runs)                          # baseline per run, updated incrementally
+
+    rewards = None if stats is not None else np.empty((env.n_runs, steps))
+    if timer is not None: timer.start()
+    for t in range(steps):
+        exp_prefers = np.exp(k_prefers-np.max(k_prefers, axis=1, keepdims=True))
+        probs = exp_prefers/np.sum(exp_prefers, axis=1, keepdims=True)             # action probabilities
+        u = rng.random((env.n_runs, 1))
+        actions = np.minimum(np.sum(np.cumsum(probs, axis=1) < u, axis=1), env.k-1)  # action choice (inverse CDF)
+        if timer is not None: timer.lap('select')
+
+        cur_rewards = env.step(actions)
+        if timer is not None: timer.lap('env')
+        if t == 0: average_rewards[:] = cur_rewards
+        step_sizes = alpha*(cur_rewards-average_rewards)
+        k_prefers -= step_sizes[:, None]*probs
+        k_prefers[runs, actions] += step_sizes
+        # update baseline
+        if baseline_step is None: average_rewards += (cur_rewards-average_rewards)/(t+1)
+        else: average_rewards += baseline_step*(cur_rewards-average_rewards)
+        if stats is not None: stats.add_step(t, cur_rewards, actions == env.optimal_actions)
+        else: rewards[:, t] = cur_rewards
+        if timer is not None: timer.lap('update')
+    return rewards if stats is None else stats
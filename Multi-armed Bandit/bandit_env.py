@@ -1,29 +1,72 @@
-from tqdm import tqdm
 import numpy as np
 
+from block_rng import as_block_rng
+
 class BanditEnv(object):
     """ Environment of k-armed Bandit """
 
-    def __init__(self, k):
-        """ init Bandit environment """
+    def __init__(self, k, rng=None):
+        """ init Bandit environment (rng: seed, np.random.Generator or shared BlockRNG) """
         self.k = k                              # number of levers, parameter of k-armed Bandit
-        self.k_qs = np.random.randn(k)          # k expected rewards of each levers
+        self.rng = as_block_rng(rng)            # block-prefetched random numbers
+        self.k_qs = self.rng.standard_normal(k) # k expected rewards of each levers
+        self.optimal_action = np.argmax(self.k_qs)
 
     def step(self, action):
         """ step action (0, 1, ..., or k-1) to env """
-        return np.random.normal(self.k_qs[action], 1)   # return reward
+        return self.k_qs[action]+self.rng.standard_normal()    # return reward
+
+class BatchBanditEnv(object):
+    """ n_runs independent k-armed Bandit environments stepped as one array """
+
+    def __init__(self, k, n_runs, rng=None):
+        """ init n_runs Bandit environments (rng: seed, np.random.Generator or shared BlockRNG) """
+        self.k = k                              # number of levers of each Bandit
+        self.n_runs = n_runs                    # number of independent Bandits (runs)
+        self.rng = as_block_rng(rng)            # block-prefetched random numbers
+        self.k_qs = self.rng.standard_normal((n_runs, k))   # (n_runs, k) expected rewards of each levers
+        self.runs = np.arange(n_runs)           # row index of each run
+        self.optimal_actions = np.argmax(self.k_qs, axis=1)
+
+    def step(self, actions):
+        """ step one action per run (array of n_runs levers) to env """
+        return self.k_qs[self.runs, actions]+self.rng.standard_normal(self.n_runs)    # return (n_runs,) rewards
+
+class CommonBanditEnv(BatchBanditEnv):
+    """ n_runs k-armed Bandit environments with pre-sampled reward noise per (run, step),
+        rewind() replays the same environments so several algorithms see common random numbers """
+
+    def __init__(self, k, n_runs, steps, rng=None):
+        """ init n_runs Bandit environments for runs of up to `steps` pulls """
+        super(CommonBanditEnv, self).__init__(k, n_runs, rng)
+        # the t-th pull of a run always gets the same noise, whichever algorithm pulls which lever
+        # (O(n_runs*steps) memory, independent of k)
+        self.noises = self.rng.rng.standard_normal((steps, n_runs), dtype=np.float32)   # row t: noise of step t
+        self.t = 0
+
+    def rewind(self):
+        """ restart all runs with the same true values and noise """
+        self.t = 0
+
+    def step(self, actions):
+        """ step one action per run (array of n_runs levers) to env """
+        noises = self.noises[self.t]
+        self.t += 1
+        return self.k_qs[self.runs, actions]+noises    # return (n_runs,) rewards
 
 if __name__ == '__main__':
     """ test BanditEnv """
+    from tqdm import tqdm
 
-    env = BanditEnv(k=10)
+    rng = np.random.default_rng()
+    env = BanditEnv(k=10, rng=rng)
     print("[#] Initialized %d-armed Bandit environment."%env.k)
     print("[#] True values of each levers: %ls"%env.k_qs)
 
     k_q_evals = np.zeros(env.k)                 # initial values of Q(a)
     k_times = np.zeros(env.k)                   # selected times of each a
     for it in tqdm(range(100000)):
-        a = np.random.randint(10)               # random policy
+        a = env.rng.integers(10)                # random policy
         cur_reward = env.step(a)
         k_times[a] += 1
         k_q_evals[a] += (cur_reward-k_q_evals[a])/k_times[a]
@@ -0,0 +1,131 @@
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+
+from bandit_env import BanditEnv, BatchBanditEnv
+from bandit_algorithms import *
+
+# name: (algorithm, parameters, batched)
+BENCHMARKS = {
+    'epsilon_greedy': (epsilon_greedy, dict(epsilon=0.1), False),
+    'epsilon_greedy_indexed': (epsilon_greedy, dict(epsilon=0.1, indexed=True), False),
+    'upper_confidence_bound': (upper_confidence_bound, dict(c=1), False),
+    'upper_confidence_bound_indexed': (upper_confidence_bound, dict(c=1, indexed=True), False),
+    'gradient_bandit': (gradient_bandit, dict(alpha=0.1), False),
+    'batch_epsilon_greedy': (batch_epsilon_greedy, dict(epsilon=0.1), True),
+    'batch_upper_confidence_bound': (batch_upper_confidence_bound, dict(c=1), True),
+    'batch_gradient_bandit': (batch_gradient_bandit, dict(alpha=0.1), True),
+}
+PHASES = ('select', 'env', 'update')
+
+class PhaseTimer(object):
+    """ accumulate wall time of the select / env / update phases of an algorithm's loop """
+
+    def __init__(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.last = time.perf_counter()
+
+    def start(self):
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        """ charge the time since the last lap to phase """
+        now = time.perf_counter()
+        self.totals[phase] += now-self.last
+        self.last = now
+
+def make_env(batched, k, runs, seed):
+    return BatchBanditEnv(k, runs, rng=seed) if batched else BanditEnv(k, rng=seed)
+
+def measure(name, k, steps, runs, repeat=3, seed=0):
+    """ steps/sec (best of repeat), peak memory and per-phase time of one benchmark case
+        (a batched algorithm steps `runs` runs at once, a single-run algorithm runs them one after another) """
+    algorithm, params, batched = BENCHMARKS[name]
+    envs = 1 if batched else runs
+
+    best = np.inf
+    for it in range(repeat):
+        env_list = [make_env(batched, k, runs, seed+i) for i in range(envs)]
+        start = time.perf_counter()
+        for env in env_list: algorithm(env, steps=steps, **params)
+        best = min(best, time.perf_counter()-start)
+
+    # phases in a separate pass, the timer itself costs a little
+    timer = PhaseTimer()
+    for i in range(envs): algorithm(make_env(batched, k, runs, seed+i), steps=steps, timer=timer, **params)
+    phase_total = sum(timer.totals.values())
+
+    # peak memory of one run (or one batch) including its environment
+    tracemalloc.start()
+    algorithm(make_env(batched, k, runs, seed), steps=steps, **params)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'algorithm': name, 'k': k, 'steps': steps, 'runs': runs,
+        'seconds': best,
+        'steps_per_sec': runs*steps/best,
+        'peak_memory_bytes': peak,
+        'phase_seconds': dict(timer.totals),                                    # instrumented pass
+        'phase_shares': {phase: timer.totals[phase]/phase_total for phase in PHASES},
+    }
+
+def case_key(result):
+    return '%s/k=%d/steps=%d/runs=%d'%(result['algorithm'], result['k'], result['steps'], result['runs'])
+
+def compare(results, baseline, tolerance):
+    """ cases whose steps/sec fell more than tolerance below the baseline """
+    baseline = {case_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None: continue
+        ratio = result['steps_per_sec']/old['steps_per_sec']
+        if ratio < 1-tolerance: regressions.append((case_key(result), ratio))
+    return regressions
+
+def main(args):
+    names = args.algorithms or list(BENCHMARKS)
+    results = []
+    for name in names:
+        batched = BENCHMARKS[name][2]
+        for k in args.ks:
+            for steps in args.steps:
+                for runs in (args.batch_runs if batched else args.runs):
+                    result = measure(name, k, steps, runs, repeat=args.repeat, seed=args.seed)
+                    results.append(result)
+                    print("[#] %-55s %12.0f steps/s  %8.1f MB  select %4.0f%%  env %4.0f%%  update %4.0f%%"%(
+                        case_key(result), result['steps_per_sec'], result['peak_memory_bytes']/2**20,
+                        *[100*result['phase_shares'][phase] for phase in PHASES]))
+
+    report = {
+        'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+    print("[#] Results written to %s."%args.output)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f: regressions = compare(results, json.load(f), args.tolerance)
+        for key, ratio in regressions: print("[!] Regression: %s runs at %.0f%% of baseline."%(key, 100*ratio))
+        if regressions: sys.exit(1)
+        print("[#] No regression against %s."%args.baseline)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the bandit algorithms.')
+    parser.add_argument('--algorithms', nargs='*', choices=list(BENCHMARKS), help='default: all')
+    parser.add_argument('--ks', type=int, nargs='+', default=[10, 1000], help='numbers of levers')
+    parser.add_argument('--steps', type=int, nargs='+', default=[1000], help='steps per run')
+    parser.add_argument('--runs', type=int, nargs='+', default=[10], help='runs of single-run algorithms')
+    parser.add_argument('--batch-runs', type=int, nargs='+', default=[1000, 10000], help='runs of batched algorithms')
+    parser.add_argument('--repeat', type=int, default=3, help='timing repetitions, best is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark.json', help='JSON file of results')
+    parser.add_argument('--baseline', default=None, help='JSON file of earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed steps/sec drop before flagging')
+    main(parser.parse_args())
@@ -0,0 +1,66 @@
+import numpy as np
+
+class BlockRNG(object):
+    """ np.random.Generator front-end drawing random numbers from large pre-sampled blocks
+        (same method names as np.random.Generator, reproducible for a given seed and block_size).
+        A scalar draw costs ~0.3-0.4 us instead of ~0.7-0.9 us, but the single-run algorithms spend most of a
+        step in numpy scalar indexing, argmax and softmax (select / update phases, see benchmark.py), so they
+        only run 1.1-1.4x faster with it; the batched algorithms are the fast path """
+
+    def __init__(self, rng=None, block_size=65536):
+        self.rng = np.random.default_rng(rng)   # seed, SeedSequence or Generator
+        self.block_size = block_size
+        self.normals = np.empty(0)              # pre-sampled standard normals
+        self.normal_pos = 0
+        self.uniforms = np.empty(0)             # pre-sampled uniforms in [0, 1)
+        self.uniform_pos = 0
+
+    def refill_normals(self, n=0):
+        """ keep unused normals and append a new block (at least n in total) """
+        rest = self.normals[self.normal_pos:]
+        self.normals = np.concatenate((rest, self.rng.standard_normal(max(self.block_size, n-len(rest)))))
+        self.normal_pos = 0
+
+    def refill_uniforms(self, n=0):
+        """ keep unused uniforms and append a new block (at least n in total) """
+        rest = self.uniforms[self.uniform_pos:]
+        self.uniforms = np.concatenate((rest, self.rng.random(max(self.block_size, n-len(rest)))))
+        self.uniform_pos = 0
+
+    def standard_normal(self, size=None):
+        if size is None:
+            # scalar fast path: no array allocation
+            if self.normal_pos == len(self.normals): self.refill_normals()
+            self.normal_pos += 1
+            return self.normals[self.normal_pos-1]
+        n = int(np.prod(size))
+        if self.normal_pos+n > len(self.normals): self.refill_normals(n)
+        self.normal_pos += n
+        return self.normals[self.normal_pos-n:self.normal_pos].reshape(size)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        if size is None and np.ndim(loc) == 0 and np.ndim(scale) == 0:
+            return loc+scale*self.standard_normal()
+        size = np.broadcast(loc, scale).shape if size is None else size
+        return loc+scale*self.standard_normal(size)
+
+    def random(self, size=None):
+        if size is None:
+            # scalar fast path: no array allocation
+            if self.uniform_pos == len(self.uniforms): self.refill_uniforms()
+            self.uniform_pos += 1
+            return self.uniforms[self.uniform_pos-1]
+        n = int(np.prod(size))
+        if self.uniform_pos+n > len(self.uniforms): self.refill_uniforms(n)
+        self.uniform_pos += n
+        return self.uniforms[self.uniform_pos-n:self.uniform_pos].reshape(size)
+
+    def integers(self, low, high=None, size=None):
+        """ integers in [low, high) (or [0, low) if high is None), from pre-sampled uniforms """
+        if high is None: low, high = 0, low
+        if size is None: return low+int(self.random()*(high-low))
+        return low+(self.random(size)*(high-low)).astype(np.int64)
+
+def as_block_rng(rng=None):
+    """ wrap a seed / Generator into a BlockRNG, pass BlockRNGs through so they can be shared """
+    return rng if isinstance(rng, BlockRNG) else BlockRNG(rng)
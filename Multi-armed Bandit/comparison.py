@@ -0,0 +1,24 @@
+import itertools
+import numpy as np
+
+from block_rng import BlockRNG
+from bandit_env import CommonBanditEnv
+from reward_stats import RewardStats
+from sweep import ALGORITHMS
+
+def paired_comparison(candidates, k=10, runs=2000, steps=1000, seed=0, chunk_runs=500):
+    """ run every (name, algorithm, params) candidate against the same sampled true values and
+        reward noise (common random numbers), chunk by chunk.
+        Returns {name: RewardStats} of rewards and {(name_a, name_b): RewardStats} of paired differences a-b """
+    stats = {name: RewardStats(steps) for name, algorithm, params in candidates}
+    diffs = {(a[0], b[0]): RewardStats(steps) for a, b in itertools.combinations(candidates, 2)}
+    for chunk, start in enumerate(range(0, runs, chunk_runs)):
+        # environments are sampled once per chunk and replayed for every candidate
+        env = CommonBanditEnv(k, min(chunk_runs, runs-start), steps, BlockRNG(np.random.SeedSequence(seed, spawn_key=(chunk,))))
+        rewards = {}
+        for name, algorithm, params in candidates:
+            env.rewind()
+            rewards[name] = ALGORITHMS[algorithm](env, steps=steps, **params)
+            stats[name].add(rewards[name])
+        for a, b in diffs: diffs[a, b].add(rewards[a]-rewards[b])
+    return stats, diffs
@@ -1,103 +1,163 @@
-from tqdm import tqdm
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
 
-from bandit_env import BanditEnv
-from bandit_algorithms import *
+from sweep import SweepRunner
+from param_search import successive_halving
+from comparison import paired_comparison
+from results import ResultStore, stats_columns, confidence_band
 
-def main():
+# comparison curves: name -> (plot label, parameter shown in it)
+COMPARISON_LABELS = {
+    'epsilon-greedy': (r'$\epsilon$-greedy ($\epsilon$=%.2f)', 'epsilon'),
+    'optimistic greedy': (r'greedy with optimistic initialization ($Q_0$=%.2f)', 'initial_value'),
+    'UCB': ('Upper Confidence Bound (c=%.2f)', 'c'),
+    'gradient bandit': (r'gradient bandit ($\alpha=%.2f$)', 'alpha'),
+}
+
+def parameter_study(runner, algorithm, param_grid, runs, search):
+    """ average reward of each candidate, index of the best one and RewardStats of each candidate,
+        by brute-force grid or successive halving """
+    if search == 'halving':
+        result = successive_halving(runner, algorithm, param_grid, max_runs=runs)
+        print("[#] Runs per candidate: %s (%.1f%% of the grid's simulated steps)."%(
+            result['runs'].tolist(), 100*result['steps']/(len(param_grid)*runs*runner.steps)))
+        return result['means'], result['best'], result['stats']
+    all_stats = runner.run_stats(algorithm, param_grid, runs)
+    average_rewards = np.array([np.mean(stats.mean) for stats in all_stats])
+    return average_rewards, np.argmax(average_rewards), all_stats
+
+def save_study(store, runner, args, parameter, algorithm, values, runs, study):
+    """ write a parameter study (average reward, best index and per-step statistics of each value) to store """
+    average_rewards, best, all_stats = study
+    store.write('study_' + parameter, dict({parameter: values, 'average_reward': average_rewards}, **stats_columns(all_stats)),
+                algorithm=algorithm, parameter=parameter, best=int(best), runs=runs, search=args.search,
+                k=runner.k, steps=runner.steps, seed=args.seed)
+    return values[best]
+
+def compute(args, store):
     """ Test 4 algorithms (ε-greedy, Upper Confidence Bound, gradient bandit
-    and greedy with optimistic initial values) on 10-armed bandit testbed.
+    and greedy with optimistic initial values) on 10-armed bandit testbed,
+    and write the parameter studies and the comparison to store.
     """
     print("[#] Test algorithms: ε-greedy, greedy with optimistic initial values, Upper-Confidence-Bound, gradient bandit.")
     print("[#] Test environment: 10-armed bandit.\n")
     k = 10
+    runner = SweepRunner(k=k, steps=1000, seed=args.seed, workers=args.workers, cache_dir=args.cache_dir)
 
     print("[#] Parameter study for 4 algorithms.")
-    fig, ax = plt.subplots()
-    ax.set_xscale('log', basex=2)
 
     # ε-greedy
     print("[1] Test ε-greedy with ε ranging from 0.01 to 0.25.")
     epsilons = np.arange(0.01, 0.26, 0.01)
-    average_rewards = np.zeros_like(epsilons)
-    for i in tqdm(range(len(epsilons))):
-        # 10000 tests
-        rewards = [epsilon_greedy(BanditEnv(10), epsilon=epsilons[i]) for it in range(10000)]
-        average_rewards[i] = np.mean(rewards)
-    best_epsilon = epsilons[np.argmax(average_rewards)]
+    # 10000 tests
+    study = parameter_study(runner, 'epsilon_greedy', [dict(epsilon=epsilon) for epsilon in epsilons], 10000, args.search)
+    best_epsilon = save_study(store, runner, args, 'epsilon', 'epsilon_greedy', epsilons, 10000, study)
     print("[1] Best ε for ε-greedy method is %.2f.\n"%best_epsilon)
-    ax.plot(epsilons, average_rewards, label=r'$\epsilon$-greedy ($\epsilon$)')
 
     # greedy method with optimistic initial values
     print("[2] Test greedy method with initial Q(a) ranging from 0.25 to 4.")
     Q_inits = np.arange(0.25, 4, 0.1)
-    average_rewards = np.zeros_like(Q_inits)
-    for i in tqdm(range(len(Q_inits))):
-        # 10000 tests
-        rewards = [epsilon_greedy(BanditEnv(10), epsilon=0, initial_value=Q_inits[i]) for it in range(10000)]
-        average_rewards[i] = np.mean(rewards)
-    best_Qinit = Q_inits[np.argmax(average_rewards)]
+    # 10000 tests
+    study = parameter_study(runner, 'epsilon_greedy', [dict(epsilon=0, initial_value=Q_init) for Q_init in Q_inits], 10000, args.search)
+    best_Qinit = save_study(store, runner, args, 'initial_value', 'epsilon_greedy', Q_inits, 10000, study)
     print("[2] Best initial Q(a) for greedy method is %.2f.\n"%best_Qinit)
-    ax.plot(Q_inits, average_rewards, label=r'greedy with optimistic initialization ($Q_0$)')
 
     # Upper Confidence Bound
     print("[3] Test Upper-Confidence-Bound action selection with c(weight of uncertainty) ranging from 0.05 to 4.")
     cs = np.arange(0.05, 4, 0.1)
-    average_rewards = np.zeros_like(cs)
-    for i in tqdm(range(len(cs))):
-        # 10000 tests
-        rewards = [upper_confidence_bound(BanditEnv(10), c=cs[i]) for it in range(10000)]
-        average_rewards[i] = np.mean(rewards)
-    best_c = cs[np.argmax(average_rewards)]
+    # 10000 tests
+    study = parameter_study(runner, 'upper_confidence_bound', [dict(c=c) for c in cs], 10000, args.search)
+    best_c = save_study(store, runner, args, 'c', 'upper_confidence_bound', cs, 10000, study)
     print("[3] Best c for Upper-Confidence-Bound action selection is %.2f.\n"%best_c)
-    ax.plot(cs, average_rewards, label='Upper Confidence Bound (c)')
 
     # gradient bandit
     print("[4] Test gradient bandit algorithm with α(learning rate) ranging from 0.02 to 4.")
     alphas = np.arange(0.02, 4, 0.1)
-    average_rewards = np.zeros_like(alphas)
-    for i in tqdm(range(len(alphas))):
-        # 1000 tests
-        rewards = [gradient_bandit(BanditEnv(10), alpha=alphas[i]) for it in range(1000)]
-        average_rewards[i] = np.mean(rewards)
-    best_alpha = alphas[np.argmax(average_rewards)]
+    # 10000 tests
+    study = parameter_study(runner, 'gradient_bandit', [dict(alpha=alpha) for alpha in alphas], 10000, args.search)
+    best_alpha = save_study(store, runner, args, 'alpha', 'gradient_bandit', alphas, 10000, study)
     print("[4] Best α for gradient bandit algorithm is %.2f.\n"%best_alpha)
-    ax.plot(alphas, average_rewards, label=r'gradient bandit ($\alpha$)')
+
+    # 2000 runs for best parameter
+    print("[#] Test 4 algorithms with best parameters respectively.")
+    print("[#] Each algorithm runs for 1000 steps in one test.")
+    print("[#] 2000 runs for each algorithm to calculate average reward at each step.")
+    runs = 2000
+    candidates = [
+        ('epsilon-greedy', 'epsilon_greedy', dict(epsilon=float(best_epsilon))),
+        ('optimistic greedy', 'epsilon_greedy', dict(epsilon=0, initial_value=float(best_Qinit))),
+        ('UCB', 'upper_confidence_bound', dict(c=float(best_c))),
+        ('gradient bandit', 'gradient_bandit', dict(alpha=float(best_alpha)))]
+    if args.paired:
+        # all algorithms against the same environments and reward noise
+        print("[#] Common random numbers: all algorithms see the same true values and reward noise in each run.")
+        stats, diffs = paired_comparison(candidates, k=k, runs=runs, steps=runner.steps, seed=args.seed)
+        for (a, b), diff in diffs.items():
+            print("[#] %s - %s: %+.4f ± %.4f average reward (95%% CI, paired)."%(a, b, diff.run_mean, 1.96*diff.run_std_error))
+        store.write('comparison_differences', stats_columns(list(diffs.values())), pairs=[list(pair) for pair in diffs],
+                    runs=runs, k=k, steps=runner.steps, seed=args.seed)
+    else:
+        stats = {name: runner.run_stats(algorithm, [params], runs)[0] for name, algorithm, params in candidates}
+    store.write('comparison', stats_columns([stats[name] for name, algorithm, params in candidates]),
+                names=[name for name, algorithm, params in candidates],
+                algorithms=[algorithm for name, algorithm, params in candidates],
+                params=[params for name, algorithm, params in candidates],
+                runs=runs, paired=args.paired, k=k, steps=runner.steps, seed=args.seed)
+    print("[#] Results written to %s.\n"%store.directory)
+
+def render(args, store):
+    """ plot the parameter studies and the comparison from store only """
+    import matplotlib.pyplot as plt             # only the render stage needs matplotlib
 
     print("[#] Plot the average reward (over first 1000 steps) of 4 algorithms under different parameters respectively.")
+    fig, ax = plt.subplots()
+    try: ax.set_xscale('log', base=2)
+    except TypeError: ax.set_xscale('log', basex=2)
+    for parameter, label in [('epsilon', r'$\epsilon$-greedy ($\epsilon$)'),
+                             ('initial_value', r'greedy with optimistic initialization ($Q_0$)'),
+                             ('c', 'Upper Confidence Bound (c)'),
+                             ('alpha', r'gradient bandit ($\alpha$)')]:
+        columns, meta = store.read('study_' + parameter)
+        ax.plot(columns[parameter], columns['average_reward'], label=label)
     plt.axis([0, 4, 1, 1.6])
     plt.xlabel(r'$\epsilon$    $\alpha$    c    $Q_0$')
     plt.ylabel('Average reward over first 1000 steps')
     plt.legend()
-    plt.savefig("./figs/parameter_study.png", dpi=500)
+    plt.savefig(args.figs_dir + "/parameter_study.png", dpi=args.dpi)
 
-    # 2000 runs for best parameter
-    print("[#] Test 4 algorithms with best parameters respectively.")
-    print("[#] Each algorithm runs for 1000 steps in one test.")
-    print("[#] 2000 runs for each algorithm to calculate average reward at each step.")
-    epsilon_greedy_rewards = []
-    greedy_optimistic_init_rewards = []
-    UCB_rewards = []
-    gradient_bandit_rewards = []
-    steps, runs= 1000, 2000
-    for it in tqdm(range(runs)):
-        epsilon_greedy_rewards.append(epsilon_greedy(BanditEnv(10), epsilon=best_epsilon))
-        greedy_optimistic_init_rewards.append(epsilon_greedy(BanditEnv(10), epsilon=0, initial_value=best_Qinit))
-        UCB_rewards.append(upper_confidence_bound(BanditEnv(10), c=best_c))
-        gradient_bandit_rewards.append(gradient_bandit(BanditEnv(10), alpha=best_alpha))
-
-    print("[#] Plot average reward (over 2000 runs) v.s. steps of 4 algorithms with best parameters respectively.")
+    columns, meta = store.read('comparison')
+    print("[#] Plot average reward (over %d runs, with 95%% confidence bands) v.s. steps of 4 algorithms with best parameters respectively."%meta['runs'])
     fig, ax = plt.subplots()
-    ax.plot(np.mean(epsilon_greedy_rewards, axis=0), label=r'$\epsilon$-greedy ($\epsilon$=%.2f)'%best_epsilon)
-    ax.plot(np.mean(greedy_optimistic_init_rewards, axis=0), label=r'greedy with optimistic initialization ($Q_0$=%.2f)'%best_Qinit)
-    ax.plot(np.mean(UCB_rewards, axis=0), label='Upper Confidence Bound (c=%.2f)'%best_c)
-    ax.plot(np.mean(gradient_bandit_rewards, axis=0), label=r'gradient bandit ($\alpha=%.2f$)'%best_alpha)
+    steps = np.arange(meta['steps'])
+    for row, (name, params) in enumerate(zip(meta['names'], meta['params'])):
+        label, parameter = COMPARISON_LABELS[name]
+        ax.plot(columns['mean'][row], label=label%params[parameter])
+        ax.fill_between(steps, *confidence_band(columns, row), alpha=0.2)
 
     plt.xlabel('steps')
-    plt.ylabel('Average reward over 2000 runs')
+    plt.ylabel('Average reward over %d runs'%meta['runs'])
     plt.legend()
-    plt.savefig("./figs/comparison.png", dpi=500)
-    plt.show()
+    plt.savefig(args.figs_dir + "/comparison.png", dpi=args.dpi)
+    # only a GUI backend can show the figures (Agg, e.g. on a headless machine, would warn)
+    if fig.canvas.required_interactive_framework is not None: plt.show()
+
+def main(args):
+    store = ResultStore(args.store)
+    if args.stage in ('compute', 'all'): compute(args, store)
+    if args.stage in ('render', 'all'): render(args, store)
 
-if __name__ == '__main__': main()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parameter study and comparison of bandit algorithms.')
+    parser.add_argument('--stage', choices=['compute', 'render', 'all'], default='all',
+                        help='simulate and write the result store, plot from it, or both')
+    parser.add_argument('--store', default='./results', help='result store directory')
+    parser.add_argument('--figs-dir', default='./figs', help='directory of the rendered figures')
+    parser.add_argument('--dpi', type=int, default=500, help='resolution of the rendered figures')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0, help='root seed of all runs')
+    parser.add_argument('--cache-dir', default='./cache', help='on-disk cache of finished run-chunks')
+    parser.add_argument('--search', choices=['grid', 'halving'], default='grid',
+                        help='pick best parameters by brute-force grid (10000 runs each) or adaptive successive halving')
+    parser.add_argument('--paired', action='store_true',
+                        help='compare the best parameters with common random numbers (shared environments and noise)')
+    main(parser.parse_args())
@@ -0,0 +1,37 @@
+import numpy as np
+
+def successive_halving(runner, algorithm, param_grid, initial_runs=None, max_runs=10000, precision=0.005, z=3.0, progress=True):
+    """ adaptive parameter search: run every candidate with a small budget, drop candidates whose
+        confidence interval of average reward lies below the best one's, and double the runs of the
+        remaining contenders until one is left, all intervals are within ±precision, or max_runs is reached.
+        Returns a dict with the best candidate index, per-candidate mean, half width, runs and RewardStats
+        (of its last round). """
+    n = len(param_grid)
+    means, half_widths = np.full(n, np.nan), np.full(n, np.inf)
+    runs_given = np.zeros(n, dtype=np.int64)
+    last_stats = [None]*n
+    contenders = list(range(n))
+    runs = runner.chunk_runs if initial_runs is None else initial_runs
+    simulated_runs = runner.simulated_runs
+    while True:
+        runs = min(runs, max_runs)
+        # with a cache dir, extra runs of a contender reuse its cached chunks and only new chunks are simulated
+        all_stats = runner.run_stats(algorithm, [param_grid[i] for i in contenders], runs, progress)
+        for i, stats in zip(contenders, all_stats):
+            means[i], half_widths[i], runs_given[i] = stats.run_mean, z*stats.run_std_error, runs
+            last_stats[i] = stats
+
+        best = contenders[int(np.argmax(means[contenders]))]
+        best_lower = means[best]-half_widths[best]
+        contenders = [i for i in contenders if means[i]+half_widths[i] >= best_lower]   # drop dominated ones
+        if len(contenders) == 1 or np.max(half_widths[contenders]) <= precision or runs >= max_runs: break
+        runs *= 2
+
+    return {
+        'best': best,
+        'means': means,
+        'half_widths': half_widths,
+        'runs': runs_given,
+        'stats': last_stats,
+        'steps': (runner.simulated_runs-simulated_runs)*runner.steps,  # steps simulated in total (cache misses)
+    }
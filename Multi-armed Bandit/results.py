@@ -0,0 +1,82 @@
+import os
+import json
+import shutil
+import numpy as np
+
+class ResultStore(object):
+    """ experiment results on disk, one directory per table with one .npy file per column (read back as
+        read-only memmaps, so large tables are paged in only where they are used) and its metadata in meta.json """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, table, name=''):
+        return os.path.join(self.directory, table, name)
+
+    def write(self, table, columns, **meta):
+        """ write (or replace) table from {name: array} columns and JSON-serializable metadata """
+        tmp_path = self.path(table).rstrip(os.sep) + '.%d.tmp'%os.getpid()
+        os.makedirs(tmp_path, exist_ok=True)
+        for name, column in columns.items(): np.save(os.path.join(tmp_path, name + '.npy'), np.asarray(column))
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump(dict(meta, columns=list(columns)), f, indent=2)
+        # swap the whole table in by renames, a reader never sees columns of two different writes: the old table
+        # is renamed aside (os.replace cannot replace a non-empty directory), the new one in, then the old one deleted
+        old_path = self.path(table).rstrip(os.sep) + '.%d.old'%os.getpid()
+        if os.path.exists(self.path(table)): os.replace(self.path(table), old_path)
+        os.replace(tmp_path, self.path(table))
+        if os.path.exists(old_path): shutil.rmtree(old_path)
+
+    def read(self, table, mmap=True):
+        """ ({name: column}, metadata) of table, columns memory-mapped unless mmap is False. meta.json and the
+            columns are opened through one handle on the table directory, so they come from the same write even
+            if another write swaps the table meanwhile (read again if that write deleted the directory under it) """
+        directory = os.open(self.path(table), os.O_RDONLY)
+        opener = lambda name, flags: os.open(name, flags, dir_fd=directory)
+        try:
+            with open('meta.json', opener=opener) as f: meta = json.load(f)
+            files = {name: open(name + '.npy', 'rb', opener=opener) for name in meta.pop('columns')}
+        except FileNotFoundError:
+            replaced = os.fstat(directory).st_ino != os.stat(self.path(table)).st_ino
+            if not replaced: raise
+            return self.read(table, mmap)
+        finally:
+            os.close(directory)
+        columns = {}
+        for name, f in files.items():
+            with f: columns[name] = load_npy(f, mmap)
+        return columns, meta
+
+    def tables(self):
+        # not the directories of a write in progress
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.exists(self.path(name, 'meta.json')) and not name.endswith(('.tmp', '.old')))
+
+def load_npy(f, mmap=True):
+    """ array of the .npy file open as f, a read-only memmap unless mmap is False (np.load maps only paths) """
+    if not mmap: return np.load(f)
+    version = np.lib.format.read_magic(f)
+    read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+    shape, fortran_order, dtype = read_header(f)
+    if dtype.hasobject or not np.prod(shape, dtype=np.int64):
+        f.seek(0)
+        return np.load(f)       # nothing to map
+    return np.memmap(f, dtype=dtype, mode='r', shape=shape, order='F' if fortran_order else 'C', offset=f.tell())
+
+def stats_columns(all_stats):
+    """ columns of a list of RewardStats over the same steps, one row each: per-step mean, variance,
+        run count and %-optimal (float32 / int32 curves), and the average reward over whole runs """
+    return {
+        'mean': np.array([stats.mean for stats in all_stats], dtype=np.float32),
+        'variance': np.array([stats.variance for stats in all_stats], dtype=np.float32),
+        'count': np.array([stats.count for stats in all_stats], dtype=np.int32),
+        'optimal_ratio': np.array([stats.optimal_ratio for stats in all_stats], dtype=np.float32),
+        'run_mean': np.array([stats.run_mean for stats in all_stats]),
+        'run_std_error': np.array([stats.run_std_error for stats in all_stats]),
+    }
+
+def confidence_band(columns, row, z=1.96):
+    """ (lower, upper) normal confidence band of the mean reward at each step of one row of stats columns """
+    std_error = np.sqrt(columns['variance'][row]/np.maximum(columns['count'][row], 1))
+    return columns['mean'][row]-z*std_error, columns['mean'][row]+z*std_error
@@ -0,0 +1,104 @@
+import numpy as np
+
+class RewardStats(object):
+    """ streaming per-step reward statistics over runs (Welford / Chan et al. merge),
+        memory is O(steps) however many runs are added """
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.count = np.zeros(steps, dtype=np.int64)    # runs seen at each step
+        self.mean = np.zeros(steps)                     # mean reward at each step
+        self.m2 = np.zeros(steps)                       # sum of squared deviations at each step
+        self.optimal = np.zeros(steps, dtype=np.int64)  # runs that chose the optimal action at each step
+        # statistics of the average reward of whole runs (over all steps)
+        self.run_count, self.run_mean, self.run_m2 = 0, 0.0, 0.0
+        self.run_totals = None                          # reward sums of the batch being fed by add_step
+
+    def combine(self, index, count, mean, m2, optimal=0):
+        """ merge a group with (count, mean, m2, optimal) into the statistics at index """
+        total = self.count[index]+count
+        ratio = count/np.maximum(total, 1)              # share of the new group, 0 when both are empty
+        delta = mean-self.mean[index]
+        self.mean[index] += delta*ratio
+        self.m2[index] += m2+delta**2*self.count[index]*ratio
+        self.count[index] = total
+        self.optimal[index] += optimal
+
+    def combine_runs(self, count, mean, m2):
+        """ merge a group of whole-run average rewards into the run statistics """
+        total = self.run_count+count
+        ratio = count/max(total, 1)
+        delta = mean-self.run_mean
+        self.run_mean += delta*ratio
+        self.run_m2 += m2+delta**2*self.run_count*ratio
+        self.run_count = total
+
+    def add_runs(self, averages):
+        """ add average rewards of whole runs """
+        mean = np.mean(averages)
+        self.combine_runs(len(averages), mean, np.sum((averages-mean)**2))
+
+    def add_step(self, t, rewards, optimal=None):
+        """ add rewards of a batch of runs at step t (optimal: bool mask of optimal actions),
+            steps of one batch must be fed in order 0, 1, ..., steps-1 """
+        mean = np.mean(rewards)
+        self.combine(t, len(rewards), mean, np.sum((rewards-mean)**2),
+                     0 if optimal is None else np.count_nonzero(optimal))
+        if t == 0: self.run_totals = np.zeros(len(rewards))
+        self.run_totals += rewards
+        if t == self.steps-1:
+            self.add_runs(self.run_totals/self.steps)
+            self.run_totals = None
+
+    def add(self, rewards, optimal=None):
+        """ add (n_runs, steps) rewards of whole runs """
+        rewards = np.atleast_2d(rewards)
+        mean = np.mean(rewards, axis=0)
+        self.combine(slice(None), rewards.shape[0], mean, np.sum((rewards-mean)**2, axis=0),
+                     0 if optimal is None else np.count_nonzero(np.atleast_2d(optimal), axis=0))
+        self.add_runs(np.mean(rewards, axis=1))
+
+    def merge(self, other):
+        """ merge statistics of another RewardStats over the same steps """
+        self.combine(slice(None), other.count, other.mean, other.m2, other.optimal)
+        self.combine_runs(other.run_count, other.run_mean, other.run_m2)
+        return self
+
+    @property
+    def variance(self):
+        """ sample variance of reward at each step """
+        return self.m2/np.maximum(self.count-1, 1)
+
+    @property
+    def std_error(self):
+        """ standard error of the mean reward at each step """
+        return np.sqrt(self.variance/np.maximum(self.count, 1))
+
+    @property
+    def optimal_ratio(self):
+        """ fraction of runs choosing the optimal action at each step """
+        return self.optimal/np.maximum(self.count, 1)
+
+    @property
+    def run_std_error(self):
+        """ standard error of the average reward over whole runs """
+        return np.sqrt(self.run_m2/max(self.run_count-1, 1)/max(self.run_count, 1))
+
+    def confidence_band(self, z=1.96):
+        """ (lower, upper) normal confidence band of the mean reward at each step """
+        return self.mean-z*self.std_error, self.mean+z*self.std_error
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, count=self.count, mean=self.mean, m2=self.m2, optimal=self.optimal,
+                     run_stats=np.array([self.run_count, self.run_mean, self.run_m2]))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        stats = cls(len(data['mean']))
+        stats.count, stats.mean, stats.m2, stats.optimal = data['count'], data['mean'], data['m2'], data['optimal']
+        if 'run_stats' in data:
+            run_count, stats.run_mean, stats.run_m2 = data['run_stats'].tolist()
+            stats.run_count = int(run_count)
+        return stats
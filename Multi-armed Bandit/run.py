@@ -0,0 +1,63 @@
+import time
+import inspect
+import argparse
+import numpy as np
+
+from sweep import ALGORITHMS, SweepRunner
+
+def algorithm_params(algorithm):
+    """ names of the parameters of algorithm a run can set (SweepRunner passes the others) """
+    return [name for name in inspect.signature(ALGORITHMS[algorithm]).parameters
+            if name not in ('env', 'steps', 'rng', 'stats', 'timer')]
+
+def parse_params(items, names):
+    """ ['name=value', ...] as a parameter dict, ValueError unless each name is one of names
+        and each value a number (or None) """
+    params = {}
+    for item in items:
+        if '=' not in item: raise ValueError("parameter %r is not name=value"%item)
+        name, value = item.split('=', 1)
+        if name not in names: raise ValueError("unknown parameter %r (expected one of: %s)"%(name, ', '.join(names)))
+        try: params[name] = None if value == 'None' else float(value)
+        except ValueError: raise ValueError("parameter %s=%r is not a number or None"%(name, value))
+    return params
+
+def main(args):
+    params = args.params
+    runner = SweepRunner(k=args.k, steps=args.steps, seed=args.seed, workers=args.workers, cache_dir=args.cache_dir)
+    start = time.perf_counter()
+    stats = runner.run_stats(args.algorithm, [params], args.runs, progress=args.progress)[0]
+    print("[#] %s %s: %.4f ± %.4f average reward over %d runs of %d steps (95%% CI) in %.3f s."%(
+        args.algorithm, params, stats.run_mean, 1.96*stats.run_std_error, args.runs, args.steps, time.perf_counter()-start))
+    stats.save(args.output)
+    print("[#] Per-step reward statistics written to %s."%args.output)
+    if args.plot is not None:
+        # matplotlib is only imported when a plot is asked for
+        import matplotlib
+        matplotlib.use('Agg')
+        from matplotlib import pyplot as plt
+        fig, ax = plt.subplots()
+        ax.plot(stats.mean)
+        ax.fill_between(np.arange(args.steps), *stats.confidence_band(), alpha=0.2)
+        plt.xlabel('steps')
+        plt.ylabel('Average reward over %d runs'%args.runs)
+        fig.savefig(args.plot, dpi=150)
+        print("[#] Average reward plotted to %s."%args.plot)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run one bandit algorithm on the k-armed testbed, without a display.')
+    parser.add_argument('algorithm', choices=list(ALGORITHMS))
+    parser.add_argument('params', nargs='*', help="parameters as name=value, e.g. epsilon=0.1")
+    parser.add_argument('--k', type=int, default=10, help='number of levers')
+    parser.add_argument('--steps', type=int, default=1000, help='steps of each run')
+    parser.add_argument('--runs', type=int, default=2000, help='number of runs')
+    parser.add_argument('--seed', type=int, default=0, help='root seed of all runs')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes')
+    parser.add_argument('--cache-dir', default=None, help='on-disk cache of finished run-chunks (default: none)')
+    parser.add_argument('--output', default='rewards.npz', help='.npz of per-step reward statistics (RewardStats)')
+    parser.add_argument('--progress', action='store_true', help='show a progress bar (imports tqdm)')
+    parser.add_argument('--plot', default=None, help='.png of the average reward (imports matplotlib)')
+    args = parser.parse_args()
+    try: args.params = parse_params(args.params, algorithm_params(args.algorithm))
+    except ValueError as error: parser.error(str(error))
+    main(args)
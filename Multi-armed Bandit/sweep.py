@@ -0,0 +1,108 @@
+import os
+import json
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from block_rng import BlockRNG
+from bandit_env import BatchBanditEnv
+from reward_stats import RewardStats
+from bandit_algorithms import batch_epsilon_greedy, batch_upper_confidence_bound, batch_gradient_bandit
+
+ALGORITHMS = {
+    'epsilon_greedy': batch_epsilon_greedy,
+    'upper_confidence_bound': batch_upper_confidence_bound,
+    'gradient_bandit': batch_gradient_bandit,
+}
+# version of the simulated random streams, part of every cache file name: bump it whenever a change to the
+# algorithms, environments or BlockRNG changes the rewards of a job, so chunks cached before are not reused
+STREAM_VERSION = 2
+
+def job_key(algorithm, params, k, steps, seed, chunk, n_runs):
+    """ stable hex key of one (algorithm, parameters, run-chunk) job """
+    params = {name: None if value is None else float(value) for name, value in params.items()}
+    desc = json.dumps([algorithm, params, k, steps, seed, chunk, n_runs], sort_keys=True)
+    return hashlib.sha1(desc.encode()).hexdigest()
+
+def run_chunk(algorithm, params, k, steps, seed, chunk, n_runs):
+    """ run n_runs of algorithm on a fresh batched env, return their per-step RewardStats """
+    # root seed as entropy, job identity as spawn key: the stream never depends on which worker runs it
+    key = job_key(algorithm, params, k, steps, None, chunk, n_runs)
+    seq = np.random.SeedSequence(seed, spawn_key=(int(key, 16),))
+    rng = BlockRNG(seq)
+    env = BatchBanditEnv(k, n_runs, rng=rng)
+    return ALGORITHMS[algorithm](env, steps=steps, rng=rng, stats=RewardStats(steps), **params)
+
+class SweepRunner(object):
+    """ run parameter sweeps of the batched bandit algorithms over a process pool,
+        caching finished run-chunks on disk """
+
+    def __init__(self, k=10, steps=1000, seed=0, chunk_runs=1000, workers=None, cache_dir='./cache'):
+        self.k = k                              # number of levers
+        self.steps = steps                      # steps of each run
+        self.seed = seed                        # root seed of all jobs
+        self.chunk_runs = chunk_runs            # runs per job
+        self.workers = os.cpu_count() if workers is None else workers
+        self.cache_dir = cache_dir              # None disables the cache
+        if cache_dir is not None: os.makedirs(cache_dir, exist_ok=True)
+        self.simulated_runs = 0                 # runs actually simulated (not loaded from the cache) so far
+
+    def chunks(self, runs):
+        """ split runs into (chunk index, chunk runs) """
+        return [(i, min(self.chunk_runs, runs-i*self.chunk_runs)) for i in range((runs+self.chunk_runs-1)//self.chunk_runs)]
+
+    def cache_path(self, algorithm, params, chunk, n_runs):
+        key = job_key(algorithm, params, self.k, self.steps, self.seed, chunk, n_runs)
+        return os.path.join(self.cache_dir, '%s-v%d-%s.npz'%(algorithm, STREAM_VERSION, key))
+
+    def load(self, path):
+        if self.cache_dir is None or not os.path.exists(path): return None
+        stats = RewardStats.load(path)
+        return stats if stats.run_count > 0 else None     # written before whole-run statistics were kept
+
+    def save(self, path, result):
+        if self.cache_dir is None: return
+        tmp_path = path + '.%d.tmp'%os.getpid()
+        result.save(tmp_path)
+        os.replace(tmp_path, path)             # atomic, an interrupted sweep never leaves a partial chunk
+
+    def run(self, algorithm, param_grid, runs, progress=True):
+        """ run algorithm `runs` times for each parameter dict in param_grid,
+            return (len(param_grid), steps) average reward at each step """
+        return np.array([stats.mean for stats in self.run_stats(algorithm, param_grid, runs, progress)])
+
+    def run_stats(self, algorithm, param_grid, runs, progress=True):
+        """ run algorithm `runs` times for each parameter dict in param_grid,
+            return one RewardStats (per-step mean, variance, %-optimal) per parameter dict """
+        results, jobs = {}, []
+        for i, params in enumerate(param_grid):
+            for chunk, n_runs in self.chunks(runs):
+                path = self.cache_path(algorithm, params, chunk, n_runs) if self.cache_dir is not None else None
+                result = self.load(path)
+                if result is None: jobs.append(((i, chunk), path, (algorithm, params, self.k, self.steps, self.seed, chunk, n_runs)))
+                else: results[i, chunk] = result
+
+        self.simulated_runs += sum(args[-1] for job, path, args in jobs)
+        if progress:
+            from tqdm import tqdm               # only when a progress bar is asked for
+            bar = tqdm(total=len(jobs))
+        if self.workers <= 1:
+            for job, path, args in jobs:
+                results[job] = run_chunk(*args)
+                self.save(path, results[job])
+                if progress: bar.update()
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(run_chunk, *args): (job, path) for job, path, args in jobs}
+                for future in as_completed(futures):
+                    job, path = futures[future]
+                    results[job] = future.result()
+                    self.save(path, results[job])
+                    if progress: bar.update()
+        if progress: bar.close()
+
+        # merge chunks in a fixed order so the result is independent of completion order
+        all_stats = [RewardStats(self.steps) for params in param_grid]
+        for i in range(len(param_grid)):
+            for chunk, n_runs in self.chunks(runs): all_stats[i].merge(results[i, chunk])
+        return all_stats
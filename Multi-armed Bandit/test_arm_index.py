@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from bandit_env import BanditEnv
+from bandit_algorithms import epsilon_greedy, upper_confidence_bound
+
+class RecordingEnv(BanditEnv):
+    """ a BanditEnv that keeps the actions it was stepped with """
+
+    def __init__(self, k, rng=None):
+        super(RecordingEnv, self).__init__(k, rng)
+        self.actions = []
+
+    def step(self, action):
+        self.actions.append(int(action))
+        return super(RecordingEnv, self).step(action)
+
+def run(algorithm, k, seed, indexed, **params):
+    env = RecordingEnv(k, rng=seed)
+    rewards = algorithm(env, steps=1500, indexed=indexed, **params)
+    return rewards, env.actions
+
+@pytest.mark.parametrize('k', [1, 2, 3, 10, 37, 64])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('epsilon, initial_value', [(0.0, 0.0), (0.1, 0.0), (0.0, 5.0), (0.01, 5.0)])
+def test_indexed_epsilon_greedy_makes_the_same_choices(k, seed, epsilon, initial_value):
+    rewards, actions = run(epsilon_greedy, k, seed, False, epsilon=epsilon, initial_value=initial_value)
+    indexed_rewards, indexed_actions = run(epsilon_greedy, k, seed, True, epsilon=epsilon, initial_value=initial_value)
+    assert indexed_actions == actions
+    np.testing.assert_array_equal(indexed_rewards, rewards)
+
+@pytest.mark.parametrize('k', [1, 2, 3, 10, 37, 64])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('c', [0.0, 0.5, 1, 2, 5])
+def test_indexed_upper_confidence_bound_makes_the_same_choices(k, seed, c):
+    rewards, actions = run(upper_confidence_bound, k, seed, False, c=c)
+    indexed_rewards, indexed_actions = run(upper_confidence_bound, k, seed, True, c=c)
+    assert indexed_actions == actions
+    np.testing.assert_array_equal(indexed_rewards, rewards)
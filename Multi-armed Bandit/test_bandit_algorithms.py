@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from bandit_env import BanditEnv, BatchBanditEnv
+from reward_stats import RewardStats
+from bandit_algorithms import (epsilon_greedy, upper_confidence_bound, gradient_bandit,
+                               batch_epsilon_greedy, batch_upper_confidence_bound, batch_gradient_bandit)
+
+K, STEPS = 10, 300
+# single-run algorithm, its batched version, parameters
+ALGORITHMS = {
+    'epsilon_greedy': (epsilon_greedy, batch_epsilon_greedy, dict(epsilon=0.1)),
+    'optimistic_greedy': (epsilon_greedy, batch_epsilon_greedy, dict(epsilon=0.0, initial_value=5.0)),
+    'upper_confidence_bound': (upper_confidence_bound, batch_upper_confidence_bound, dict(c=2)),
+    'gradient_bandit': (gradient_bandit, batch_gradient_bandit, dict(alpha=0.1)),
+    'gradient_bandit_recency': (gradient_bandit, batch_gradient_bandit, dict(alpha=0.1, baseline_step=0.1)),
+}
+
+@pytest.mark.parametrize('name', list(ALGORITHMS))
+def test_batched_output_shapes(name):
+    single, batched, params = ALGORITHMS[name]
+    rewards = batched(BatchBanditEnv(K, 7, rng=0), steps=25, **params)
+    assert rewards.shape == (7, 25) and np.all(np.isfinite(rewards))
+    stats = batched(BatchBanditEnv(K, 7, rng=0), steps=25, stats=RewardStats(25), **params)
+    assert stats.mean.shape == stats.variance.shape == stats.optimal_ratio.shape == (25,)
+    assert np.all(stats.count == 7) and stats.run_count == 7
+    # the statistics are of the same rewards as the array (same seed)
+    np.testing.assert_allclose(stats.mean, rewards.mean(axis=0))
+    np.testing.assert_allclose(stats.run_mean, rewards.mean())
+
+@pytest.mark.parametrize('name', list(ALGORITHMS))
+def test_batched_average_rewards_match_single_runs(name):
+    single, batched, params = ALGORITHMS[name]
+    singles = np.array([single(BanditEnv(K, rng=seed), steps=STEPS, **params) for seed in range(500)])
+    batch = batched(BatchBanditEnv(K, 2000, rng=12345), steps=STEPS, **params)
+    # average reward over windows of 50 steps, within 4 standard errors of the difference of the two estimates
+    for window in range(0, STEPS, 50):
+        a, b = singles[:, window:window+50].mean(axis=1), batch[:, window:window+50].mean(axis=1)
+        std_error = np.sqrt(a.var(ddof=1)/len(a)+b.var(ddof=1)/len(b))
+        assert abs(a.mean()-b.mean()) < 4*std_error, (window, a.mean(), b.mean(), std_error)
+
+def gradient_bandit_by_means(env, alpha=0.1, steps=1000):
+    """ gradient bandit whose baseline is recomputed as the mean of all rewards so far, the first reward
+        being its own baseline (reference for the incremental average) """
+    k_prefers = np.zeros(env.k)
+    rewards, actions = np.zeros(steps), np.zeros(steps, dtype=np.int64)
+    for t in range(steps):
+        exp_prefers = np.exp(k_prefers-k_prefers.max())
+        probs = exp_prefers/exp_prefers.sum()
+        actions[t] = a = min(probs.cumsum().searchsorted(env.rng.random()), env.k-1)
+        rewards[t] = env.step(a)
+        baseline = np.mean(rewards[:t]) if t else rewards[0]
+        k_prefers -= alpha*(rewards[t]-baseline)*probs
+        k_prefers[a] += alpha*(rewards[t]-baseline)
+    return rewards, actions
+
+class RecordingEnv(BanditEnv):
+    """ a BanditEnv that keeps the actions it was stepped with """
+
+    def __init__(self, k, rng=None):
+        super(RecordingEnv, self).__init__(k, rng)
+        self.actions = []
+
+    def step(self, action):
+        self.actions.append(int(action))
+        return super(RecordingEnv, self).step(action)
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_gradient_bandit_baseline_is_the_mean_of_past_rewards(seed):
+    env = RecordingEnv(K, rng=seed)
+    rewards = gradient_bandit(env, alpha=0.4, steps=2000)
+    reference, actions = gradient_bandit_by_means(BanditEnv(K, rng=seed), alpha=0.4, steps=2000)
+    assert env.actions == actions.tolist()
+    np.testing.assert_array_equal(rewards, reference)
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_batched_gradient_bandit_baseline_is_the_mean_of_past_rewards(seed):
+    rewards = batch_gradient_bandit(BatchBanditEnv(K, 50, rng=seed), alpha=0.4, steps=500)
+    # reference: the same draws, baselines recomputed from all rewards so far (the first reward its own baseline)
+    env = BatchBanditEnv(K, 50, rng=seed)
+    k_prefers, reference = np.zeros((50, K)), np.zeros((50, 500))
+    for t in range(500):
+        probs = np.exp(k_prefers-k_prefers.max(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        actions = np.minimum(np.sum(np.cumsum(probs, axis=1) < env.rng.random((50, 1)), axis=1), K-1)
+        reference[:, t] = env.step(actions)
+        baselines = reference[:, :t].mean(axis=1) if t else reference[:, 0]
+        k_prefers -= 0.4*(reference[:, t]-baselines)[:, None]*probs
+        k_prefers[env.runs, actions] += 0.4*(reference[:, t]-baselines)
+    np.testing.assert_array_equal(rewards, reference)
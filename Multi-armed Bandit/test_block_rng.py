@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from block_rng import BlockRNG, as_block_rng
+
+def draws(rng):
+    """ a mix of scalar and array draws of every kind, crossing many block refills of a small block """
+    out = []
+    for i in range(40):
+        out += [rng.standard_normal(), rng.random(), rng.integers(10), rng.integers(3, 8)]
+        out += list(rng.standard_normal(i%9)) + list(rng.random((i%4, 3)).reshape(-1))
+        out += list(rng.integers(5, size=i%6)) + list(rng.normal(2.0, 0.5, size=i%5)) + [rng.normal(-1.0, 3.0)]
+    return np.array(out, dtype=np.float64)
+
+@pytest.mark.parametrize('block_size', [1, 7, 64])
+def test_same_seed_gives_the_same_stream_across_refills(block_size):
+    np.testing.assert_array_equal(draws(BlockRNG(3, block_size)), draws(BlockRNG(3, block_size)))
+    assert not np.array_equal(draws(BlockRNG(3, block_size)), draws(BlockRNG(4, block_size)))
+
+@pytest.mark.parametrize('block_size', [1, 5, 64, 65536])
+def test_one_kind_of_draw_is_the_generator_stream(block_size):
+    # refills draw consecutive chunks of the same generator: for one kind of draw, the stream is the
+    # generator's own, whatever the block size and however the draws are split
+    rng = BlockRNG(11, block_size)
+    normals = np.concatenate([np.atleast_1d(rng.standard_normal(n)) for n in (None, 3, 70, None, 1, 200)])
+    np.testing.assert_array_equal(normals, np.random.default_rng(11).standard_normal(len(normals)))
+    rng = BlockRNG(12, block_size)
+    uniforms = np.concatenate([np.atleast_1d(rng.random(n)) for n in (None, 3, 70, None, 1, 200)])
+    np.testing.assert_array_equal(uniforms, np.random.default_rng(12).random(len(uniforms)))
+
+def test_integers_are_uniform():
+    n, high = 200000, 7
+    counts = np.bincount(BlockRNG(5, 1000).integers(high, size=n), minlength=high)
+    assert len(counts) == high
+    # chi-square statistic of 6 degrees of freedom, below its 0.999 quantile (22.46)
+    expected = n/high
+    assert np.sum((counts-expected)**2/expected) < 22.46
+    rng = BlockRNG(6, 64)
+    scalars = np.bincount([rng.integers(2, 5) for i in range(3000)])
+    assert len(scalars) == 5 and scalars[0] == scalars[1] == 0 and np.all(np.abs(scalars[2:]-1000) < 120)
+
+def test_normal_is_the_scaled_generator_stream():
+    rng = BlockRNG(9, 16)
+    samples = np.concatenate([rng.normal(2.0, 0.5, size=10), [rng.normal(-1.0, 3.0)], rng.normal(np.zeros(30), 2.0)])
+    normals = np.random.default_rng(9).standard_normal(41)
+    np.testing.assert_allclose(samples, np.concatenate([2.0+0.5*normals[:10], [-1.0+3.0*normals[10]], 2.0*normals[11:]]))
+
+def test_as_block_rng_shares_block_rngs():
+    rng = BlockRNG(0)
+    assert as_block_rng(rng) is rng
+    np.testing.assert_array_equal(as_block_rng(8).random(5), np.random.default_rng(8).random(5))
@@ -0,0 +1,27 @@
+import numpy as np
+
+from bandit_env import CommonBanditEnv
+from block_rng import BlockRNG
+from comparison import paired_comparison
+
+def test_rewind_replays_the_same_rewards():
+    env = CommonBanditEnv(5, 4, 3, BlockRNG(0))
+    actions = np.array([0, 1, 2, 3])
+    first = [env.step(actions) for t in range(3)]
+    env.rewind()
+    np.testing.assert_array_equal(first, [env.step(actions) for t in range(3)])
+
+def test_noise_is_shared_across_levers_and_independent_of_k():
+    env = CommonBanditEnv(1000, 4, 3, BlockRNG(0))
+    assert env.noises.shape == (3, 4)
+    a = env.step(np.zeros(4, dtype=np.int64))
+    env.rewind()
+    b = env.step(np.full(4, 7))
+    np.testing.assert_allclose(a-env.k_qs[:, 0], b-env.k_qs[:, 7], rtol=1e-6)
+
+def test_paired_comparison_of_identical_candidates_has_zero_difference():
+    # UCB draws no random numbers of its own, so identical candidates see identical rewards
+    candidates = [('a', 'upper_confidence_bound', dict(c=1)), ('b', 'upper_confidence_bound', dict(c=1))]
+    stats, diffs = paired_comparison(candidates, k=10, runs=50, steps=20, chunk_runs=20)
+    np.testing.assert_allclose(stats['a'].mean, stats['b'].mean)
+    assert diffs['a', 'b'].run_mean == 0 and diffs['a', 'b'].run_m2 == 0
@@ -0,0 +1,18 @@
+from sweep import SweepRunner
+from param_search import successive_halving
+
+def test_steps_count_every_simulated_run():
+    # 30 runs are chunks of 20 + 10, so 60 runs do not reuse the cached 10-run chunk
+    runner = SweepRunner(k=10, steps=20, seed=0, chunk_runs=20, workers=1, cache_dir=None)
+    grid = [dict(epsilon=0.0), dict(epsilon=0.1)]
+    result = successive_halving(runner, 'epsilon_greedy', grid, initial_runs=30, max_runs=60, precision=0.0, z=1e6, progress=False)
+    assert result['runs'].tolist() == [60, 60]
+    assert result['steps'] == (2*30+2*60)*runner.steps
+
+def test_steps_skip_cached_chunks(tmp_path):
+    runner = SweepRunner(k=10, steps=20, seed=0, chunk_runs=20, workers=1, cache_dir=str(tmp_path))
+    grid = [dict(epsilon=0.0), dict(epsilon=0.1)]
+    result = successive_halving(runner, 'epsilon_greedy', grid, initial_runs=20, max_runs=40, precision=0.0, z=1e6, progress=False)
+    assert result['steps'] == 2*40*runner.steps
+    again = successive_halving(runner, 'epsilon_greedy', grid, initial_runs=20, max_runs=40, precision=0.0, z=1e6, progress=False)
+    assert again['steps'] == 0
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+
+from results import ResultStore
+
+def test_write_replaces_whole_table(tmp_path):
+    store = ResultStore(str(tmp_path))
+    store.write('table', dict(a=np.arange(3), b=np.ones(2)), runs=1)
+    store.write('table', dict(a=np.arange(5)), runs=2)
+    columns, meta = store.read('table')
+    np.testing.assert_array_equal(columns['a'], np.arange(5))
+    assert list(columns) == ['a'] and meta == dict(runs=2)
+    assert not os.path.exists(store.path('table', 'b.npy'))
+    assert os.listdir(str(tmp_path)) == ['table']
+    assert store.tables() == ['table']
+
+def test_read_maps_columns_of_every_shape(tmp_path):
+    store = ResultStore(str(tmp_path))
+    columns = dict(curve=np.arange(12, dtype=np.float32).reshape(3, 4), fortran=np.asfortranarray(np.eye(3)),
+                   scalar=np.array(2.5), empty=np.zeros((0, 4)), counts=np.arange(5, dtype=np.int32))
+    store.write('table', columns)
+    for mmap in (True, False):
+        read, meta = store.read('table', mmap=mmap)
+        assert list(read) == list(columns) and meta == {}
+        for name, column in columns.items():
+            np.testing.assert_array_equal(read[name], column)
+            assert read[name].dtype == column.dtype
+
+def test_read_keeps_the_columns_of_one_write(tmp_path, monkeypatch):
+    store = ResultStore(str(tmp_path))
+    store.write('table', dict(a=np.zeros(4)), runs=1)
+    os_open, writes = os.open, [dict(a=np.ones(4))]
+
+    def open_and_swap(name, flags, dir_fd=None):
+        """ os.open where another write swaps the table in right after the reader opened meta.json """
+        fd = os_open(name, flags, dir_fd=dir_fd)
+        if name == 'meta.json' and writes: store.write('table', writes.pop(), runs=2)
+        return fd
+    monkeypatch.setattr(os, 'open', open_and_swap)
+    columns, meta = store.read('table')
+    # the old table was deleted under the reader, which read the new one whole
+    assert meta == dict(runs=2)
+    np.testing.assert_array_equal(columns['a'], np.ones(4))
@@ -0,0 +1,57 @@
+import numpy as np
+
+from reward_stats import RewardStats
+
+def test_add_matches_numpy():
+    rewards = np.random.default_rng(0).normal(1.0, 2.0, size=(30, 7))
+    stats = RewardStats(7)
+    stats.add(rewards)
+    np.testing.assert_allclose(stats.mean, rewards.mean(axis=0))
+    np.testing.assert_allclose(stats.variance, rewards.var(axis=0, ddof=1))
+    np.testing.assert_allclose(stats.run_mean, rewards.mean())
+    assert stats.run_count == 30
+
+def test_merge_equals_one_pass():
+    rng = np.random.default_rng(1)
+    chunks = [rng.normal(size=(n, 5)) for n in (1, 4, 13)]
+    merged = RewardStats(5)
+    for chunk in chunks:
+        part = RewardStats(5)
+        part.add(chunk)
+        merged.merge(part)
+    rewards = np.concatenate(chunks)
+    np.testing.assert_allclose(merged.mean, rewards.mean(axis=0))
+    np.testing.assert_allclose(merged.variance, rewards.var(axis=0, ddof=1))
+    np.testing.assert_allclose(merged.run_mean, rewards.mean(axis=1).mean())
+    np.testing.assert_allclose(merged.run_m2, np.sum((rewards.mean(axis=1)-rewards.mean())**2))
+
+def test_merge_into_empty_and_of_empty():
+    rewards = np.random.default_rng(2).normal(size=(6, 3))
+    full = RewardStats(3)
+    full.add(rewards)
+    stats = RewardStats(3).merge(full).merge(RewardStats(3))
+    np.testing.assert_allclose(stats.mean, full.mean)
+    np.testing.assert_allclose(stats.m2, full.m2)
+    assert stats.run_count == 6
+
+def test_add_step_equals_add():
+    rng = np.random.default_rng(3)
+    rewards = rng.normal(size=(8, 4))
+    optimal = rng.random((8, 4)) < 0.5
+    by_step, whole = RewardStats(4), RewardStats(4)
+    for t in range(4): by_step.add_step(t, rewards[:, t], optimal[:, t])
+    whole.add(rewards, optimal)
+    np.testing.assert_allclose(by_step.mean, whole.mean)
+    np.testing.assert_allclose(by_step.m2, whole.m2)
+    np.testing.assert_array_equal(by_step.optimal, whole.optimal)
+    np.testing.assert_allclose(by_step.run_mean, whole.run_mean)
+
+def test_save_load_round_trip(tmp_path):
+    stats = RewardStats(3)
+    stats.add(np.arange(6.0).reshape(2, 3))
+    path = str(tmp_path/'stats.npz')
+    stats.save(path)
+    loaded = RewardStats.load(path)
+    np.testing.assert_array_equal(loaded.mean, stats.mean)
+    np.testing.assert_array_equal(loaded.m2, stats.m2)
+    assert (loaded.run_count, loaded.run_mean, loaded.run_m2) == (stats.run_count, stats.run_mean, stats.run_m2)
@@ -0,0 +1,25 @@
+import os
+import numpy as np
+
+import sweep
+from sweep import SweepRunner, job_key
+
+def test_job_key_is_stable_and_distinguishes_jobs():
+    key = job_key('epsilon_greedy', dict(epsilon=0.1), 10, 100, 0, 0, 50)
+    assert key == job_key('epsilon_greedy', dict(epsilon=np.float64(0.1)), 10, 100, 0, 0, 50)
+    assert key != job_key('epsilon_greedy', dict(epsilon=0.1), 10, 100, 1, 0, 50)
+    assert key != job_key('epsilon_greedy', dict(epsilon=0.1), 10, 100, 0, 1, 50)
+
+def test_cached_chunks_match_fresh_runs(tmp_path):
+    runner = SweepRunner(k=10, steps=50, seed=3, chunk_runs=20, workers=1, cache_dir=str(tmp_path))
+    fresh = runner.run_stats('epsilon_greedy', [dict(epsilon=0.1)], 50, progress=False)[0]
+    assert len(os.listdir(str(tmp_path))) == 3
+    cached = runner.run_stats('epsilon_greedy', [dict(epsilon=0.1)], 50, progress=False)[0]
+    np.testing.assert_array_equal(fresh.mean, cached.mean)
+    np.testing.assert_array_equal(fresh.m2, cached.m2)
+
+def test_stream_version_invalidates_cache(tmp_path, monkeypatch):
+    runner = SweepRunner(k=10, steps=50, seed=3, chunk_runs=20, workers=1, cache_dir=str(tmp_path))
+    path = runner.cache_path('epsilon_greedy', dict(epsilon=0.1), 0, 20)
+    monkeypatch.setattr(sweep, 'STREAM_VERSION', sweep.STREAM_VERSION+1)
+    assert runner.cache_path('epsilon_greedy', dict(epsilon=0.1), 0, 20) != path
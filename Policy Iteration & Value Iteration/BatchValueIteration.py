@@ -0,0 +1,101 @@
+import numpy as np
+from scipy import sparse
+
+from mdp import TabularMDP, TIE_TOLERANCE, VALUE_TOLERANCE
+
+class BatchValueIteration():
+    """ Value-Iteration of B variants of one layout at once (discounts, reward scalings, goal placements, ...):
+        values (B, S) are backed up together, each variant stops on its own convergence """
+
+    def __init__(self, envs, gammas=1):
+        # one GridEnv / TabularMDP shared by all variants or one per variant, one discount or one per variant
+        envs = list(envs) if isinstance(envs, (list, tuple)) else [envs]
+        gammas = np.atleast_1d(np.asarray(gammas, dtype=np.float64))
+        self.nvariants = max(len(envs), len(gammas))
+        assert len(envs) in (1, self.nvariants) and len(gammas) in (1, self.nvariants), "envs and gammas must broadcast"
+        self.envs = envs*self.nvariants if len(envs) == 1 else envs
+        self.gammas = np.broadcast_to(gammas, (self.nvariants,)).copy()
+        models = {}                     # one sparse model per distinct env
+        for env in self.envs:
+            if id(env) not in models: models[id(env)] = env if isinstance(env, TabularMDP) else TabularMDP.from_grid(env)
+        self.mdps = [models[id(env)] for env in self.envs]
+        mdp = self.mdps[0]
+        assert all(m.P.shape == mdp.P.shape for m in self.mdps), "variants must share states and actions"
+        self.nstates, self.nactions, self.shape = mdp.nstates, mdp.nactions, mdp.shape
+        # variant-minor layout: values (S, B), action values (S, A, B), so reductions run over contiguous rows
+        self.rewards = np.stack([m.rewards for m in self.mdps], axis=-1)       # (S, A, B)
+        self.terminal = np.stack([m.terminal for m in self.mdps], axis=-1)     # (S, B)
+        # a transition table shared by all variants is applied to all of them in one product (S*A, S) @ (S, B),
+        # otherwise the per-variant tables are interleaved into one (S*A*b, S*b) matrix of the b running variants
+        self.shared = all(m.P is mdp.P or same_matrix(m.P, mdp.P) for m in self.mdps)
+        self.reset()
+
+    def action_values(self, values, variants):
+        """ Bellman backup r(s,a) + γ Σ P(s'|s,a) v(s') of variants with flat values (S, len(variants)),
+            as an (S, A, len(variants)) array """
+        if self.shared:
+            successors = self.mdps[0].P @ values
+        else:
+            if not np.array_equal(variants, self.interleaved[0]):
+                self.interleaved = (variants, interleave([self.mdps[b].P for b in variants]))
+            successors = self.interleaved[1] @ values.reshape(-1)
+        action_values = successors.reshape(self.nstates, self.nactions, len(variants))
+        everyone = len(variants) == self.nvariants                      # no copies while all variants run
+        action_values *= self.gammas if everyone else self.gammas[variants]
+        action_values += self.rewards if everyone else self.rewards[:, :, variants]
+        return action_values
+
+    def value_iteration(self, tol=VALUE_TOLERANCE, max_sweeps=None):
+        """ synchronous sweeps over all variants still running, a variant stops once the max change of its sweep
+            is <= tol; the policies are then made greedy. Returns the number of sweeps of each variant (B,) """
+        values = np.ascontiguousarray(self.values.reshape(self.nvariants, -1).T)      # (S, B)
+        sweeps = np.zeros(self.nvariants, dtype=np.int64)
+        active = np.arange(self.nvariants)
+        while len(active) and (max_sweeps is None or sweeps[active[0]] < max_sweeps):
+            everyone = len(active) == self.nvariants
+            old_values = values if everyone else values[:, active]
+            action_values = self.action_values(old_values, active)
+            new_values = action_values[:, 0].copy()
+            for a in range(1, self.nactions): np.maximum(new_values, action_values[:, a], out=new_values)
+            np.copyto(new_values, old_values, where=self.terminal if everyone else self.terminal[:, active])
+            sweeps[active] += 1
+            changes = np.abs(np.subtract(new_values, old_values, out=action_values[:, 0]), out=action_values[:, 0])
+            deltas = np.max(changes, axis=0)
+            if everyone: values = new_values
+            else: values[:, active] = new_values
+            active = active[deltas > tol]
+        self.values.reshape(self.nvariants, -1)[:] = values.T
+        self.greedy_policy(values)
+        return sweeps
+
+    def greedy_policy(self, values):
+        """ set the policy of every variant to the uniform distribution over its greedy actions under values (S, B) """
+        action_values = self.action_values(values, np.arange(self.nvariants))
+        max_action_values = np.max(action_values, axis=1, keepdims=True)
+        greedy = (action_values >= max_action_values-TIE_TOLERANCE*(1+np.abs(max_action_values))).astype(np.float64)
+        greedy /= np.sum(greedy, axis=1, keepdims=True)
+        greedy[np.broadcast_to(self.terminal[:, None, :], greedy.shape)] = 0
+        self.policy.reshape(self.nvariants, -1, self.nactions)[:] = greedy.transpose(2, 0, 1)
+
+    def reset(self):
+        """ reset values and policies """
+        self.values = np.zeros(shape=(self.nvariants,)+self.shape)
+        self.policy = np.ones(shape=(self.nvariants,)+self.shape+(self.nactions,))/self.nactions
+        self.policy.reshape(self.nvariants, -1, self.nactions)[self.terminal.T] = 0
+        self.interleaved = (np.zeros(0, dtype=np.int64), None)         # model of the running variants
+
+def interleave(Ps):
+    """ one CSR matrix of b same-shape matrices (R, C): entry (r, c) of Ps[j] at (r*b+j, c*b+j),
+        so it multiplies a C-order (C, b) array into an (R, b) one """
+    b = len(Ps)
+    blocks = [P.tocoo() for P in Ps]
+    rows = np.concatenate([P.row.astype(np.int64)*b+j for j, P in enumerate(blocks)])
+    cols = np.concatenate([P.col.astype(np.int64)*b+j for j, P in enumerate(blocks)])
+    data = np.concatenate([P.data for P in blocks])
+    R, C = Ps[0].shape
+    return sparse.csr_matrix((data, (rows, cols)), shape=(R*b, C*b))
+
+def same_matrix(A, B):
+    """ whether sparse matrices A and B (CSR) hold the same entries """
+    return (A.shape == B.shape and A.nnz == B.nnz and np.array_equal(A.indptr, B.indptr)
+            and np.array_equal(A.indices, B.indices) and np.array_equal(A.data, B.data))
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+from scipy import sparse
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+from mdp import VALUE_TOLERANCE, BLOCK_STATES
+from ValueIteration import ValueIteration
+
+worker = {}     # shared arrays of the current solve, attached once per worker process
+
+def share(array):
+    """ copy array into a new shared memory block, return the block and its (name, shape, dtype) """
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+def attach(specs, nactions, gamma):
+    """ pool initializer: map the shared model and the two value buffers into this process """
+    worker.clear()
+    worker['blocks'] = [shared_memory.SharedMemory(name=name) for name, shape, dtype in specs.values()]
+    for block, (key, (name, shape, dtype)) in zip(worker['blocks'], specs.items()):
+        worker[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    worker['nactions'], worker['gamma'] = nactions, gamma
+
+def backup_tile(lo, hi, src):
+    """ Jacobi backup of states [lo, hi): read values[src], write values[1-src], return the max change """
+    nactions, values = worker['nactions'], worker['values']
+    indptr = worker['indptr'][lo*nactions:hi*nactions+1]
+    start, stop = indptr[0], indptr[-1]
+    P = sparse.csr_matrix((worker['data'][start:stop], worker['indices'][start:stop], indptr-start),
+                          shape=(len(indptr)-1, values.shape[1]))
+    action_values = worker['rewards'][lo:hi]+worker['gamma']*(P @ values[src]).reshape(-1, nactions)
+    old_values = values[src, lo:hi]
+    new_values = np.where(worker['terminal'][lo:hi], old_values, np.max(action_values, axis=1))
+    values[1-src, lo:hi] = new_values
+    return np.max(np.abs(new_values-old_values), initial=0.0)
+
+def worker_values(arrays, blocks):
+    """ the two shared value buffers (2, S), in the dtype of the solver's values """
+    return np.ndarray(arrays['values'].shape, dtype=arrays['values'].dtype, buffer=blocks['values'].buf)
+
+class ParallelValueIteration(ValueIteration):
+    """ Value-Iteration with synchronous (Jacobi) sweeps split into row tiles over a process pool,
+        values double-buffered in shared memory in the solver's dtype (float32 when compact;
+        same sweeps, same result as ValueIteration) """
+
+    def __init__(self, env, gamma=1, workers=None, tiles=None, compact=False):
+        self.workers = os.cpu_count() if workers is None else workers
+        self.tiles = 4*self.workers if tiles is None else tiles
+        super(ParallelValueIteration, self).__init__(env, gamma, compact=compact)
+
+    def tile_bounds(self):
+        """ state ranges of the tiles: bands of whole grid rows (contiguous in row-major order) """
+        row = self.mdp.shape[-1] if len(self.mdp.shape) > 1 else 1
+        nrows = self.mdp.nstates//row
+        cuts = np.linspace(0, nrows, min(self.tiles, nrows)+1).astype(np.int64)*row
+        return list(zip(cuts[:-1].tolist(), cuts[1:].tolist()))
+
+    def value_iteration(self, tol=VALUE_TOLERANCE, max_sweeps=None):
+        """ Jacobi value iteration until the max change of a sweep is <= tol, returns the number of sweeps """
+        P = self.mdp.P
+        arrays = {'data': P.data, 'indices': P.indices, 'indptr': P.indptr, 'rewards': self.mdp.rewards,
+                  'terminal': self.terminal, 'values': np.stack((self.values.reshape(-1), self.values.reshape(-1)))}
+        blocks, specs = {}, {}
+        for key, array in arrays.items(): blocks[key], specs[key] = share(array)
+        tiles, src, sweeps, pool = self.tile_bounds(), 0, 0, None
+        try:
+            if self.workers <= 1:
+                attach(specs, self.nactions, self.gamma)
+                run = lambda: [backup_tile(lo, hi, src) for lo, hi in tiles]
+            else:
+                pool = ProcessPoolExecutor(max_workers=self.workers, initializer=attach, initargs=(specs, self.nactions, self.gamma))
+                run = lambda: list(pool.map(backup_tile, *zip(*tiles), [src]*len(tiles)))
+            delta = np.inf
+            while delta > tol and (max_sweeps is None or sweeps < max_sweeps):
+                delta = max(run())                      # max over the per-tile residuals
+                # float32 (compact) values cannot resolve a change below a few units in the last place
+                if self.compact and delta <= 4*np.finfo(np.float32).eps*np.max(np.abs(worker_values(arrays, blocks)[1-src])): delta = 0.0
+                src, sweeps = 1-src, sweeps+1
+            self.values.reshape(-1)[:] = worker_values(arrays, blocks)[src]
+        finally:
+            if pool is not None: pool.shutdown()
+            worker.clear()
+            for block in blocks.values():
+                block.close()
+                block.unlink()
+        # greedy policy block by block, so a compact solve makes no (S, A) float64 temporaries
+        values = self.values.reshape(-1)
+        for start in range(0, self.mdp.nstates, BLOCK_STATES):
+            block = slice(start, start+BLOCK_STATES)
+            action_values = self.mdp.action_values(values, self.gamma, block)
+            self.greedy_policy(action_values, np.max(action_values, axis=1), block)
+        return sweeps
@@ -1,58 +1,210 @@
-import copy
 import numpy as np
 
+from mdp import TabularMDP, TIE_TOLERANCE, BLOCK_STATES, POPCOUNT, pack_policy, unpack_policy
+from multigrid import coarse_start
+
+DIRECT_MAX_STATES = 1000000     # 'auto' evaluation: sparse direct solve up to this many states, Krylov above
+
 class PolicyIteration():
     """ an implementation of Policy-Iteration method """
 
-    def __init__(self, env, gamma=1):
-        self.env = env
+    def __init__(self, env, gamma=1, evaluation='sweep', compact=False):
+        self.env = env                  # GridEnv or TabularMDP
         self.gamma = gamma
-        self.state_space = self.env.enumerate_state()
-        # action space: 0 -- up, 1 -- down, 2 -- left, 3 -- right
-        self.nactions = self.env.nactions
+        self.evaluation = evaluation    # 'sweep', 'direct', 'krylov' or 'auto'
+        # compact: float32 values and the policy as a uint8 bitmask of greedy actions per state
+        self.compact = compact
+        # sparse tabular model, over flat states s = y*ncols + x for a GridEnv
+        self.mdp = env if isinstance(env, TabularMDP) else TabularMDP.from_grid(env)
+        self.state_space = np.arange(self.mdp.nstates) if env is self.mdp else self.env.enumerate_state()
+        # action space (GridEnv): 0 -- up, 1 -- down, 2 -- left, 3 -- right
+        self.nactions = self.mdp.nactions
         self.action_space = np.arange(self.nactions)
+        assert not compact or self.nactions <= 8, "compact policies hold at most 8 actions"
+        self.terminal = self.mdp.terminal
         self.reset()
 
     def policy_evaluation(self):
-        """ policy evaluation """
+        """ policy evaluation ('sweep': synchronous sweeps until max change < 1e-4,
+            'direct' / 'krylov': solve (I-γP_π)v = r_π, 'auto': direct for small grids, Krylov for large ones) """
+        method = self.evaluation
+        if method == 'auto': method = 'direct' if self.values.size <= DIRECT_MAX_STATES else 'krylov'
+        if method == 'sweep': self.sweep_evaluation()
+        else: self.linear_evaluation(method)
+
+    def sweep_evaluation(self):
+        """ policy evaluation by synchronous sweeps over all states """
+        values = self.values.reshape(-1)                # flat views of values and policy
+        if self.compact:
+            # float32 values cannot resolve a change below a few units in the last place
+            delta = 100
+            while delta > max(1e-4, 4*np.finfo(np.float32).eps*np.max(np.abs(values))):
+                new_values = self.policy_backup(values)
+                delta = np.max(np.abs(new_values-values), initial=0.0)
+                values[:] = new_values
+            return
+        policy = self.action_probabilities()
         delta = 100
         while delta > 1e-4:
-            old_values = copy.deepcopy(self.values)
-            for state in self.state_space:
-                if self.env.isDone(state): continue
-                state_value = 0
-                for action in self.action_space:
-                    next_state, reward, done = self.env.transition(state, action)
-                    next_state_value = self.values[next_state[1]][next_state[0]]
-                    state_value += self.policy[state[1]][state[0]][action]*(reward+self.gamma*next_state_value)
-                self.values[state[1]][state[0]] = state_value
-            delta = np.max(np.abs(old_values-self.values))
-
-    def policy_improvement(self):
-        """ policy improvement """
-        for state in self.state_space:
-            if self.env.isDone(state): continue
-            action_values = []
-            for action in self.action_space:
-                next_state, reward, done = self.env.transition(state, action)
-                next_state_value = self.values[next_state[1]][next_state[0]]
-                action_values.append(reward+self.gamma*next_state_value)
-            max_action_value = np.max(action_values)
-            self.policy[state[1]][state[0]] = (action_values==max_action_value).astype(np.float32)
-            self.policy[state[1]][state[0]] /= np.sum(self.policy[state[1]][state[0]])
-
-    def policy_iteration(self):
-        """ policy iteration """
-        delta = 100
-        while delta != 0:
+            # terminal states have an all-zero policy, so their value stays 0
+            new_values = np.sum(policy*self.mdp.action_values(values, self.gamma), axis=1)
+            delta = np.max(np.abs(new_values-values))
+            values[:] = new_values
+
+    def policy_backup(self, values):
+        """ one evaluation sweep r_π + γP_π v of the compact policy, averaging the backups of each state's
+            greedy actions straight from the bitmask, block by block """
+        policy, new_values = self.policy.reshape(-1), np.empty_like(values)
+        for start in range(0, len(values), BLOCK_STATES):
+            block = slice(start, start+BLOCK_STATES)
+            # terminal states have no greedy actions, so their value stays 0
+            new_values[block] = self.policy_average(self.mdp.action_values(values, self.gamma, block), policy[block])
+        return new_values
+
+    def policy_average(self, action_values, bits):
+        """ average of action_values (n, A) over the greedy actions of bitmask bits (n,), 0 for none """
+        greedy_sum = sum(action_values[:, a]*((bits >> a) & 1) for a in range(self.nactions))
+        return greedy_sum/np.maximum(POPCOUNT[bits], 1)
+
+    def linear_evaluation(self, method):
+        """ policy evaluation by solving (I-γP_π)v = r_π with a sparse direct solver or BiCGSTAB """
+        from scipy import sparse
+        from scipy.sparse import linalg                 # slow to import, only needed here
+        P, r = self.mdp.policy_matrix(self.policy if self.compact else self.action_probabilities())
+        A = (sparse.identity(len(r), format='csr')-self.gamma*P).tocsr()
+        values = self.values.reshape(-1)
+        if method == 'direct':
+            values[:] = linalg.spsolve(A.tocsc(), r)
+            return
+        # Krylov solve warm-started from the previous values
+        try: solution, info = linalg.bicgstab(A, r, x0=values, rtol=1e-10, atol=1e-8, maxiter=10*len(r))
+        except TypeError: solution, info = linalg.bicgstab(A, r, x0=values, tol=1e-10, atol=1e-8, maxiter=10*len(r))
+        values[:] = solution
+        if info != 0: self.sweep_evaluation()           # not converged: finish with sweeps from the Krylov iterate
+
+    def policy_improvement(self, action_values=None, states=None, keep=False):
+        """ policy improvement (of all states, or of states with their action_values) to all the greedy actions,
+            returns the number of states whose policy was not greedy (its expected action value more than the
+            tie tolerance below the max). keep: leave the policy of the other states as it is """
+        values = self.values.reshape(-1)                # flat view of values
+        if self.compact and action_values is None and states is None:
+            # block by block, so no (S, A) float64 temporaries
+            return sum(self.policy_improvement(states=slice(start, start+BLOCK_STATES), keep=keep)
+                       for start in range(0, len(values), BLOCK_STATES))
+        if action_values is None: action_values = self.mdp.action_values(values, self.gamma, states)
+        if states is None: states = slice(None)
+        max_action_values = np.max(action_values, axis=1)
+        tie_gap = TIE_TOLERANCE*(1+np.abs(max_action_values))
+        greedy = action_values >= (max_action_values-tie_gap)[:, None]
+        greedy[self.terminal[states]] = False
+        if self.compact:
+            policy = self.policy.reshape(-1)
+            improved = self.policy_average(action_values, policy[states]) < max_action_values-tie_gap
+            improved &= ~self.terminal[states]
+            policy[states] = np.where(improved, pack_policy(greedy), policy[states]) if keep else pack_policy(greedy)
+            return int(np.count_nonzero(improved))
+        policy = self.policy.reshape(-1, self.nactions)
+        improved = np.sum(policy[states]*action_values, axis=1) < max_action_values-tie_gap
+        improved &= ~self.terminal[states]
+        greedy = greedy/np.maximum(np.sum(greedy, axis=1, keepdims=True), 1)
+        policy[states] = np.where(improved[:, None], greedy, policy[states]) if keep else greedy
+        return int(np.count_nonzero(improved))
+
+    def action_probabilities(self, states=None):
+        """ policy as probabilities (S, A), or of states; unpacked on demand from a compact policy """
+        policy = self.policy.reshape(-1) if self.compact else self.policy.reshape(-1, self.nactions)
+        if states is not None: policy = policy[states]
+        return unpack_policy(policy, self.nactions) if self.compact else policy
+
+    def policy_iteration(self, checkpoint=None):
+        """ policy iteration (with a Checkpoint: on its files, resumed from and saved to them after iterations),
+            returns the number of iterations, counted since the first run """
+        changes, iterations = 1, 0
+        if checkpoint is not None: iterations = checkpoint.attach(self).get('iterations', 0)
+        while changes != 0:
             self.policy_evaluation()
-            old_policy = copy.deepcopy(self.policy)
-            self.policy_improvement()
-            delta = np.max(np.abs(old_policy-self.policy))
+            # switching among near-tied actions can go on forever on large grids, keep near-greedy policies
+            changes = self.policy_improvement(keep=True)
+            iterations += 1
+            if checkpoint is not None: checkpoint.update(iterations=iterations, policy_changes=changes)
+        self.policy_improvement()                       # all the greedy actions of the final values
+        if checkpoint is not None: checkpoint.save()
+        return iterations
+
+    def multigrid_solve(self, tol=1e-9, min_size=16):
+        """ policy iteration starting from the greedy policy of values solved on coarser grids (GridEnv only),
+            returns the number of iterations on this grid """
+        values = self.values.reshape(-1)                # flat view of values
+        values[:] = coarse_start(self.env, self.gamma, tol, min_size).reshape(-1)
+        self.policy_improvement()
+        # coarse grids drop walls one cell thin, so their values can be too optimistic: at γ=1 the greedy policy
+        # may walk into such a wall forever, and has no finite value. Value iteration sweeps on this grid until
+        # it ends the episode from every state
+        while self.gamma == 1 and not self.mdp.is_proper(self.policy):
+            action_values = self.mdp.action_values(values, self.gamma)
+            self.policy_improvement(action_values)
+            values[:] = np.where(self.terminal, values, np.max(action_values, axis=1))
+        return self.policy_iteration()
+
+    def modified_policy_iteration(self, sweeps=10, epsilon=1e-6, max_iterations=100000):
+        """ modified policy iteration: a Bellman update with policy improvement, then `sweeps` evaluation
+            sweeps of the greedy policy (0: value iteration, large: policy iteration), until the span of the
+            Bellman update v' - v is below epsilon*(1-γ)/γ. For γ<1 that makes the greedy policy epsilon-optimal
+            (its value is within epsilon of the optimal one); the returned values are not themselves within epsilon
+            of the optimal values. For γ=1 the threshold is epsilon and only a convergence test, without a bound.
+            Greedy sets hold actions up to the tie tolerance below the max, so that much span is allowed on top.
+            Returns per-iteration stats (sweeps, residual, policy_changes), also kept in self.stats """
+        values = self.values.reshape(-1)                # flat view of values
+        threshold = epsilon*(1-self.gamma)/self.gamma if 0 < self.gamma < 1 else epsilon
+        self.stats = []
+        for iteration in range(max_iterations):
+            if self.compact:
+                # Bellman update and improvement block by block, so no (S, A) float64 temporaries
+                new_values, changes = values.copy(), 0
+                for start in range(0, len(values), BLOCK_STATES):
+                    block = slice(start, start+BLOCK_STATES)
+                    action_values = self.mdp.action_values(values, self.gamma, block)
+                    np.copyto(new_values[block], np.max(action_values, axis=1), where=~self.terminal[block])
+                    changes += self.policy_improvement(action_values, block, keep=True)
+            else:
+                action_values = self.mdp.action_values(values, self.gamma)
+                new_values = np.where(self.terminal, values, np.max(action_values, axis=1))
+                changes = self.policy_improvement(action_values, keep=True)
+            residual = np.max(new_values-values)-np.min(new_values-values)     # span seminorm
+            values[:] = new_values
+            # float32 (compact) values cannot resolve a span below a few units in the last place, and evaluating
+            # a greedy set with near-tied actions keeps a span of up to the tie gap
+            scale = np.max(np.abs(values))
+            if residual < max(threshold, 4*np.finfo(values.dtype).eps*scale)+TIE_TOLERANCE*(1+scale):
+                self.stats.append(dict(sweeps=1, residual=residual, policy_changes=changes))
+                break
+            if self.compact:
+                for sweep in range(sweeps): values[:] = self.policy_backup(values)
+            else:
+                policy = self.action_probabilities()
+                for sweep in range(sweeps):
+                    values[:] = np.sum(policy*self.mdp.action_values(values, self.gamma), axis=1)
+            self.stats.append(dict(sweeps=1+sweeps, residual=residual, policy_changes=changes))
+        self.policy_improvement()                       # all the greedy actions of the final values
+        return self.stats
+
+    def update_cells(self, cells, tol=1e-9):
+        """ re-solve after the GridEnv changed at flat states cells (as returned by env.set_goals / set_blocked):
+            patch the model around them, re-propagate the optimal values from there by prioritized sweeping,
+            warm-started from the current values, and improve the policy where they changed.
+            Returns the number of states touched (patched or backed up) """
+        touched, self.backups = self.mdp.update_grid(self.env, cells, self.values, self.gamma, tol)
+        # greedy actions change where a successor's value changed
+        self.policy_improvement(states=np.union1d(touched, self.mdp.predecessors(touched)))
+        return len(touched)
 
     def reset(self):
         """ reset values and policy """
-        self.values = np.zeros(shape=(self.env.nrows, self.env.ncols))
-        self.policy = np.ones(shape=(self.env.nrows, self.env.ncols, self.nactions))/self.nactions
-        for state in self.state_space:
-            if self.env.isDone(state): self.policy[state[1]][state[0]] = np.zeros(self.nactions)
+        if self.compact:
+            self.values = np.zeros(shape=self.mdp.shape, dtype=np.float32)
+            self.policy = np.full(self.mdp.shape, (1 << self.nactions)-1, dtype=np.uint8)
+            self.policy.reshape(-1)[self.terminal] = 0
+            return
+        self.values = np.zeros(shape=self.mdp.shape)
+        self.policy = np.ones(shape=self.mdp.shape+(self.nactions,))/self.nactions
+        self.policy.reshape(-1, self.nactions)[self.terminal] = 0
@@ -1,43 +1,111 @@
-import copy
 import numpy as np
 
+from mdp import TabularMDP, TIE_TOLERANCE, VALUE_TOLERANCE, BLOCK_STATES, pack_policy, unpack_policy
+from multigrid import coarse_start
+
 class ValueIteration():
     """ an implementation of Value-Iteration method """
 
-    def __init__(self, env, gamma=1):
-        self.env = env
+    def __init__(self, env, gamma=1, compact=False):
+        self.env = env                  # GridEnv or TabularMDP
         self.gamma = gamma
-        self.state_space = self.env.enumerate_state()
-        # action space: 0 -- up, 1 -- down, 2 -- left, 3 -- right
-        self.nactions = self.env.nactions
+        # compact: float32 values and the policy as a uint8 bitmask of greedy actions per state
+        self.compact = compact
+        # sparse tabular model, over flat states s = y*ncols + x for a GridEnv
+        self.mdp = env if isinstance(env, TabularMDP) else TabularMDP.from_grid(env)
+        self.state_space = np.arange(self.mdp.nstates) if env is self.mdp else self.env.enumerate_state()
+        # action space (GridEnv): 0 -- up, 1 -- down, 2 -- left, 3 -- right
+        self.nactions = self.mdp.nactions
         self.action_space = np.arange(self.nactions)
+        assert not compact or self.nactions <= 8, "compact policies hold at most 8 actions"
+        self.terminal = self.mdp.terminal
         self.reset()
 
-    def value_iteration(self):
-        """ value iteration """
-        delta = 100
-        while delta != 0:
-            old_values = copy.deepcopy(self.values)
-            self.value_iteration_step()
-            delta = np.max(np.abs(old_values-self.values))
+    def value_iteration(self, tol=VALUE_TOLERANCE, checkpoint=None):
+        """ value iteration until the max change of a sweep is <= tol, returns the number of sweeps
+            (with a Checkpoint: on its files, resumed from and saved to them, sweeps counted since the first run) """
+        delta, sweeps = 100, 0
+        if checkpoint is not None: sweeps = checkpoint.attach(self).get('sweeps', 0)
+        while delta > tol:
+            delta = self.value_iteration_step()
+            # float32 (compact) values cannot resolve a change below a few units in the last place
+            if self.compact and delta <= 4*np.finfo(np.float32).eps*np.max(np.abs(self.values)): delta = 0.0
+            sweeps += 1
+            if checkpoint is not None: checkpoint.update(sweeps=sweeps, residual=float(delta))
+        if checkpoint is not None: checkpoint.save()
+        return sweeps
+
+    def multigrid_solve(self, tol=1e-9, min_size=16):
+        """ value iteration warm-started from the solution of coarser grids (GridEnv only),
+            returns the number of sweeps on this grid """
+        self.values[:] = coarse_start(self.env, self.gamma, tol, min_size)
+        return self.value_iteration(tol)
 
     def value_iteration_step(self):
-        """ one step of Value-Iteration """
-        for state in self.state_space:
-            if self.env.isDone(state): continue
-            action_values = []
-            for action in self.action_space:
-                next_state, reward, done = self.env.transition(state, action)
-                next_state_value = self.values[next_state[1]][next_state[0]]
-                action_values.append(reward+self.gamma*next_state_value)
-            max_action_value = np.max(action_values)
-            self.policy[state[1]][state[0]] = (action_values==max_action_value).astype(np.float32)
-            self.policy[state[1]][state[0]] /= np.sum(self.policy[state[1]][state[0]])
-            self.values[state[1]][state[0]] = max_action_value
+        """ one step of Value-Iteration (synchronous sweep over all states), returns the max change of values """
+        values = self.values.reshape(-1)                # flat view of values
+        if not self.compact:
+            action_values = self.mdp.action_values(values, self.gamma)
+            max_action_values = np.max(action_values, axis=1)
+            self.greedy_policy(action_values, max_action_values)
+            delta = np.max(np.abs(max_action_values-values), where=~self.terminal, initial=0.0)
+            np.copyto(values, max_action_values, where=~self.terminal)
+            return delta
+        # block by block, so no (S, A) float64 temporaries
+        new_values, delta = values.copy(), 0.0
+        for start in range(0, len(values), BLOCK_STATES):
+            block = slice(start, start+BLOCK_STATES)
+            action_values = self.mdp.action_values(values, self.gamma, block)
+            max_action_values = np.max(action_values, axis=1)
+            self.greedy_policy(action_values, max_action_values, block)
+            np.copyto(new_values[block], max_action_values, where=~self.terminal[block])
+            delta = max(delta, np.max(np.abs(new_values[block]-values[block]), initial=0.0))
+        values[:] = new_values
+        return delta
+
+    def greedy_policy(self, action_values, max_action_values, states=None):
+        """ set policy (of all states, or of states) to the uniform distribution over greedy actions """
+        tie_gap = TIE_TOLERANCE*(1+np.abs(max_action_values[:, None]))
+        greedy = action_values >= max_action_values[:, None]-tie_gap
+        if states is None: states = slice(None)
+        greedy[self.terminal[states]] = False
+        if self.compact:
+            self.policy.reshape(-1)[states] = pack_policy(greedy)
+            return
+        self.policy.reshape(-1, self.nactions)[states] = greedy/np.maximum(np.sum(greedy, axis=1, keepdims=True), 1)
+
+    def action_probabilities(self, states=None):
+        """ policy as probabilities (S, A), or of states; unpacked on demand from a compact policy """
+        policy = self.policy.reshape(-1) if self.compact else self.policy.reshape(-1, self.nactions)
+        if states is not None: policy = policy[states]
+        return unpack_policy(policy, self.nactions) if self.compact else policy
+
+    def prioritized_sweeping(self, tol=1e-6, max_backups=None):
+        """ asynchronous value iteration: back up only the states with the largest Bellman error
+            until it is <= tol everywhere, then make the policy greedy. Returns the number of backups """
+        self.backups = self.mdp.prioritized_sweeping(self.values, self.gamma, tol, max_backups=max_backups)
+        action_values = self.mdp.action_values(self.values, self.gamma)
+        self.greedy_policy(action_values, np.max(action_values, axis=1))
+        return self.backups
+
+    def update_cells(self, cells, tol=1e-9):
+        """ re-solve after the GridEnv changed at flat states cells (as returned by env.set_goals / set_blocked):
+            patch the model around them and re-propagate from there by prioritized sweeping, warm-started
+            from the current values. Returns the number of states touched (patched or backed up) """
+        touched, self.backups = self.mdp.update_grid(self.env, cells, self.values, self.gamma, tol)
+        # greedy actions change where a successor's value changed
+        rows = np.union1d(touched, self.mdp.predecessors(touched))
+        action_values = self.mdp.action_values(self.values, self.gamma, rows)
+        self.greedy_policy(action_values, np.max(action_values, axis=1), rows)
+        return len(touched)
 
     def reset(self):
         """ reset values and policy """
-        self.values = np.zeros(shape=(self.env.nrows, self.env.ncols))
-        self.policy = np.ones(shape=(self.env.nrows, self.env.ncols, self.nactions))/self.nactions
-        for state in self.state_space:
-            if self.env.isDone(state): self.policy[state[1]][state[0]] = np.zeros(self.nactions)
+        if self.compact:
+            self.values = np.zeros(shape=self.mdp.shape, dtype=np.float32)
+            self.policy = np.full(self.mdp.shape, (1 << self.nactions)-1, dtype=np.uint8)
+            self.policy.reshape(-1)[self.terminal] = 0
+            return
+        self.values = np.zeros(shape=self.mdp.shape)
+        self.policy = np.ones(shape=self.mdp.shape+(self.nactions,))/self.nactions
+        self.policy.reshape(-1, self.nactions)[self.terminal] = 0
@@ -0,0 +1,192 @@
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+import scipy
+
+from environment import GridEnv
+from PolicyIteration import PolicyIteration
+from ValueIteration import ValueIteration
+
+TOL = 1e-9
+# name: (solver class, constructor parameters, method, method parameters, solves to optimal values)
+BENCHMARKS = {
+    'value_iteration': (ValueIteration, dict(), 'value_iteration', dict(tol=TOL), True),
+    'value_iteration_multigrid': (ValueIteration, dict(), 'multigrid_solve', dict(tol=TOL), True),
+    'prioritized_sweeping': (ValueIteration, dict(), 'prioritized_sweeping', dict(tol=TOL), True),
+    'policy_iteration_sweep': (PolicyIteration, dict(evaluation='sweep'), 'policy_iteration', dict(), True),
+    'policy_iteration_direct': (PolicyIteration, dict(evaluation='direct'), 'policy_iteration', dict(), True),
+    'policy_iteration_krylov': (PolicyIteration, dict(evaluation='krylov'), 'policy_iteration', dict(), True),
+    'modified_policy_iteration': (PolicyIteration, dict(), 'modified_policy_iteration', dict(sweeps=10, epsilon=TOL), True),
+    'policy_evaluation_sweep': (PolicyIteration, dict(evaluation='sweep'), 'policy_evaluation', dict(), False),
+    'policy_evaluation_direct': (PolicyIteration, dict(evaluation='direct'), 'policy_evaluation', dict(), False),
+}
+# skip a solver above this many cells: evaluation sweeps of the initial uniformly random policy scale with its
+# expected episode length (~cells for γ=1), the backups of prioritized sweeping grow ~9x per doubled side at γ=1,
+# plain sweeps, Krylov and modified PI ~8x (17-34 s at 512x512 here) and the sparse LU of a direct solve ~8x
+# (36 s, 350 MB at 1024x1024), once per iteration in policy iteration (27 at γ=0.9); only multigrid value
+# iteration runs up to 2048x2048 (18 s, 1 GB)
+MAX_CELLS = {
+    'prioritized_sweeping': 64*64,
+    'policy_iteration_sweep': 64*64,
+    'policy_evaluation_sweep': 64*64,
+    'value_iteration': 512*512,
+    'policy_iteration_krylov': 512*512,
+    'modified_policy_iteration': 512*512,
+    'policy_iteration_direct': 256*256,
+    'policy_evaluation_direct': 1024*1024,
+}
+# solvers that evaluate by a linear solve: only the backups of policy improvement are counted
+LINEAR_EVALUATION = {'policy_iteration_direct', 'policy_iteration_krylov', 'policy_evaluation_direct'}
+
+def count_backups(solver):
+    """ count the state backups done through solver.mdp.action_values (one per state per call) """
+    mdp, action_values, counter = solver.mdp, solver.mdp.action_values, [0]
+    def counted(values, gamma, states=None):
+        if states is None: counter[0] += mdp.nstates
+        elif isinstance(states, slice): counter[0] += len(range(*states.indices(mdp.nstates)))
+        else: counter[0] += len(states)
+        return action_values(values, gamma, states)
+    mdp.action_values = counted
+    return counter
+
+def iterations(output):
+    """ sweeps / iterations / backups a solver method returned (1 when it returns nothing) """
+    if output is None: return 1
+    return len(output) if isinstance(output, list) else int(output)
+
+def measure(name, size, gamma, repeat=1, seed=0, memory=True, min_seconds=0.0):
+    """ wall time (best of at least repeat solves, and of as many as take min_seconds in all), iterations,
+        Bellman backups, backups/sec and peak memory (by a second, traced solve unless memory is False) of one
+        benchmark case, and its final values. Solvers of LINEAR_EVALUATION report their policy improvement
+        backups only, as improvement_backups """
+    cls, params, method, kwargs, solves = BENCHMARKS[name]
+    np.random.seed(seed)
+    env = GridEnv(size, size)
+
+    # short solves are repeated, so their best time is not one noisy sample
+    best, total, repeats = np.inf, 0.0, 0
+    while repeats < repeat or total < min_seconds:
+        solver = cls(env, gamma, **params)
+        counter = count_backups(solver)
+        start = time.perf_counter()
+        output = getattr(solver, method)(**kwargs)
+        elapsed = time.perf_counter()-start
+        best, total, repeats = min(best, elapsed), total+elapsed, repeats+1
+    # prioritized sweeping backs up states itself, the other solvers through action_values
+    backups = counter[0]+(solver.backups if method == 'prioritized_sweeping' else 0)
+
+    # peak memory of one solve including its model
+    peak = None
+    if memory:
+        tracemalloc.start()
+        getattr(cls(env, gamma, **params), method)(**kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    result = {
+        'solver': name, 'size': size, 'gamma': gamma,
+        'seconds': best,
+        'repeats': repeats,
+        'iterations': iterations(output),
+        'backups': backups,
+        'backups_per_sec': backups/best,
+        'peak_memory_bytes': peak,
+    }
+    if name in LINEAR_EVALUATION:
+        # the linear solves do no backups to count
+        result.update(backups=None, backups_per_sec=None, improvement_backups=backups)
+    return result, solver.values
+
+def case_key(result):
+    return '%s/size=%d/gamma=%g'%(result['solver'], result['size'], result['gamma'])
+
+def agreement(results, values, tolerance):
+    """ max difference of the final values of the solvers of each (size, γ) from the first one, relative to
+        max(1, max |v|), and the groups where it exceeds tolerance """
+    groups, disagreements = [], []
+    for key in sorted({(result['size'], result['gamma']) for result in results}):
+        cases = [i for i, result in enumerate(results) if (result['size'], result['gamma']) == key and BENCHMARKS[result['solver']][4]]
+        if len(cases) < 2: continue
+        reference = values[cases[0]]
+        scale = max(1.0, np.max(np.abs(reference)))
+        differences = {results[i]['solver']: float(np.max(np.abs(values[i]-reference))/scale) for i in cases[1:]}
+        group = dict(size=key[0], gamma=key[1], reference=results[cases[0]]['solver'], relative_differences=differences)
+        groups.append(group)
+        if max(differences.values()) > tolerance: disagreements.append(group)
+    return groups, disagreements
+
+def compare(results, baseline, tolerance, retime=None, retries=0):
+    """ cases whose wall time grew more than tolerance above the baseline (as speed ratios). The cases that look
+        slower are timed again by retime(result) in turns, up to retries times each with the best time kept: the
+        machine can run a few 10% slower for seconds, longer than the repeats of a short solve """
+    baseline = {case_key(result): result for result in baseline['results']}
+    slower = lambda result: baseline[case_key(result)]['seconds']/result['seconds'] < 1-tolerance
+    suspects = [result for result in results if case_key(result) in baseline and slower(result)]
+    for retry in range(retries):
+        for result in suspects:
+            result['seconds'] = min(result['seconds'], retime(result))
+            if result['backups'] is not None: result['backups_per_sec'] = result['backups']/result['seconds']
+        suspects = [result for result in suspects if slower(result)]
+    return [(case_key(result), baseline[case_key(result)]['seconds']/result['seconds']) for result in suspects]
+
+def main(args):
+    names = args.solvers or list(BENCHMARKS)
+    results, values = [], []
+    for size in args.sizes:
+        for gamma in args.gammas:
+            for name in names:
+                if size*size > MAX_CELLS.get(name, np.inf):
+                    print("[#] %-55s skipped (above %d cells)"%('%s/size=%d/gamma=%g'%(name, size, gamma), MAX_CELLS[name]))
+                    continue
+                result, final_values = measure(name, size, gamma, repeat=args.repeat, seed=args.seed,
+                                               memory=not args.no_memory, min_seconds=args.min_seconds)
+                results.append(result)
+                values.append(final_values)
+                backups = '%12s'%'-' if result['backups_per_sec'] is None else '%12.0f'%result['backups_per_sec']
+                memory = '%8s'%'-' if result['peak_memory_bytes'] is None else '%8.1f'%(result['peak_memory_bytes']/2**20)
+                print("[#] %-55s %9.3f s  %7d it  %s backups/s  %s MB"%(
+                    case_key(result), result['seconds'], result['iterations'], backups, memory), flush=True)
+
+    groups, disagreements = agreement(results, values, args.agreement)
+    for group in disagreements:
+        print("[!] Solvers disagree on size=%d gamma=%g: %s"%(group['size'], group['gamma'], group['relative_differences']))
+
+    failed = bool(disagreements)
+    if args.baseline is not None:
+        retime = lambda result: measure(result['solver'], result['size'], result['gamma'], repeat=args.repeat,
+                                        seed=args.seed, memory=False, min_seconds=args.min_seconds)[0]['seconds']
+        with open(args.baseline) as f: regressions = compare(results, json.load(f), args.tolerance, retime, args.retries)
+        for key, ratio in regressions: print("[!] Regression: %s runs at %.0f%% of baseline speed."%(key, 100*ratio))
+        if not regressions: print("[#] No regression against %s."%args.baseline)
+        failed = failed or bool(regressions)
+
+    report = {
+        'python': platform.python_version(), 'numpy': np.__version__, 'scipy': scipy.__version__,
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+        'agreement': groups,
+    }
+    with open(args.output, 'w') as f: json.dump(report, f, indent=2)
+    print("[#] Results written to %s."%args.output)
+    if failed: sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the dynamic-programming solvers on Grid-World.')
+    parser.add_argument('--solvers', nargs='*', choices=list(BENCHMARKS), help='default: all')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[8, 32, 256, 1024, 2048], help='grid sides (size x size)')
+    parser.add_argument('--gammas', type=float, nargs='+', default=[0.9, 0.99, 1.0], help='discount factors')
+    parser.add_argument('--repeat', type=int, default=1, help='timing repetitions, best is kept')
+    parser.add_argument('--min-seconds', type=float, default=1.0, help='repeat a solve until its repetitions took this long')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the second, traced solve measuring peak memory')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file of results')
+    parser.add_argument('--baseline', default=None, help='JSON file of earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed speed drop before flagging')
+    parser.add_argument('--retries', type=int, default=5, help='times a case slower than the baseline is timed again')
+    parser.add_argument('--agreement', type=float, default=1e-3, help='allowed relative difference of final values')
+    main(parser.parse_args())
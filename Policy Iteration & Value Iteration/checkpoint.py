@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from scipy import sparse
+
+class Checkpoint():
+    """ on-disk state of a long solve in directory: values and policy as .npy memmaps, the model arrays paged
+        from .npy memmaps, and the counters and residual of the solve in progress.json (with a digest of the
+        model, so a changed model is not resumed), saved every `every` iterations (or after `seconds`).
+        Any values / policy on disk is a valid start for VI and PI, so a solve killed between checkpoints
+        resumes from the files with the counters of the last checkpoint """
+
+    def __init__(self, directory, every=10, seconds=None):
+        self.directory = directory
+        self.every, self.seconds = every, seconds
+        os.makedirs(directory, exist_ok=True)
+        self.solver, self.progress = None, {}
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def attach(self, solver):
+        """ back solver.values / solver.policy with memmaps (reopened if an earlier run of the same solve
+            saved them) and page solver.mdp from disk, returns the saved progress ({} for a new solve) """
+        if self.solver is solver and solver.values is self.values: return self.progress
+        progress = {}
+        self.digest = model_digest(solver.mdp)
+        if os.path.exists(self.path('progress.json')):
+            with open(self.path('progress.json')) as f: progress = json.load(f)
+            expected = self.describe(solver)
+            if {key: progress.get(key) for key in expected} != expected:
+                raise ValueError("checkpoint in %s is of a different solve"%self.directory)
+        for name in ('values', 'policy'):
+            array, path = getattr(solver, name), self.path(name+'.npy')
+            if progress: mmap = np.load(path, mmap_mode='r+')
+            else:
+                mmap = np.lib.format.open_memmap(path, mode='w+', dtype=array.dtype, shape=array.shape)
+                mmap[...] = array
+            setattr(solver, name, mmap)
+        self.page_model(solver)
+        self.solver, self.values, self.progress = solver, solver.values, progress
+        self.count, self.saved = 0, time.time()
+        return progress
+
+    def page_model(self, solver):
+        """ write the model arrays of solver.mdp to the directory and map them back (read on demand) """
+        mdp = solver.mdp
+        arrays = dict(P_data=mdp.P.data, P_indices=mdp.P.indices, P_indptr=mdp.P.indptr,
+                      rewards=mdp.rewards, terminal=mdp.terminal)
+        for name, array in arrays.items(): np.save(self.path(name+'.npy'), array)
+        paged = {name: np.load(self.path(name+'.npy'), mmap_mode='r+') for name in arrays}
+        mdp.P = sparse.csr_matrix((paged['P_data'], paged['P_indices'], paged['P_indptr']), shape=mdp.P.shape, copy=False)
+        mdp.rewards, mdp.terminal = paged['rewards'], paged['terminal']
+        solver.terminal = mdp.terminal
+
+    def describe(self, solver):
+        """ what a checkpoint must match to be resumed by solver """
+        return dict(solver=type(solver).__name__, gamma=float(solver.gamma), model=self.digest,
+                    values=[list(solver.values.shape), solver.values.dtype.str],
+                    policy=[list(solver.policy.shape), solver.policy.dtype.str])
+
+    def update(self, **progress):
+        """ record the progress of one iteration, save a checkpoint when one is due """
+        self.progress.update(progress)
+        self.count += 1
+        if self.count%self.every == 0 or (self.seconds is not None and time.time()-self.saved >= self.seconds): self.save()
+
+    def save(self):
+        """ flush values and policy, then replace progress.json (atomically, so it always names flushed files) """
+        self.solver.values.flush()
+        self.solver.policy.flush()
+        self.progress.update(self.describe(self.solver))
+        with open(self.path('progress.json.tmp'), 'w') as f: json.dump(self.progress, f)
+        os.replace(self.path('progress.json.tmp'), self.path('progress.json'))
+        self.saved = time.time()
+
+def model_digest(mdp):
+    """ SHA-256 of the model arrays (P data / indices / indptr, rewards, terminal mask), with their dtypes and shapes """
+    digest = hashlib.sha256()
+    for array in (mdp.P.data, mdp.P.indices, mdp.P.indptr, mdp.rewards, mdp.terminal):
+        array = np.ascontiguousarray(array)
+        digest.update(('%s%s'%(array.dtype.str, array.shape)).encode())
+        digest.update(array.data)
+    return digest.hexdigest()
@@ -1,20 +1,151 @@
 import sys
 import copy
+import time
 import numpy as np
 
 from PyQt5.QtGui import QFont
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QLabel, QPushButton, QLayout, QVBoxLayout, QHBoxLayout, QScrollArea, QFileDialog
 
 import matplotlib
 matplotlib.use("Qt5Agg")
 import matplotlib.cm as cm
 from matplotlib import pyplot as plt
+from matplotlib.path import Path
+from matplotlib.patches import PathPatch
+from matplotlib.collections import LineCollection
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 
 from environment import GridEnv
 from PolicyIteration import PolicyIteration
 from ValueIteration import ValueIteration
+from mdp import VALUE_TOLERANCE
+
+TEXT_MAX_CELLS = 256            # value labels are only drawn on grids up to this many cells
+LINES_MAX_CELLS = 2500          # cell borders are only drawn on grids up to this many cells
+SNAPSHOT_INTERVAL = 0.1         # min seconds between the snapshots a running solve sends to the GUI
+
+def policy_iteration_steps(PI):
+    """ policy iteration, yielding after every evaluation and improvement """
+    changes = 1
+    while changes != 0:
+        PI.policy_evaluation()
+        yield
+        changes = PI.policy_improvement(keep=True)
+        yield
+    PI.policy_improvement()
+    yield
+
+def value_iteration_steps(VI, tol=VALUE_TOLERANCE):
+    """ value iteration, yielding after every sweep """
+    delta = np.inf
+    while delta > tol:
+        delta = VI.value_iteration_step()
+        yield
+
+def single_step(step):
+    """ steps of one solver call """
+    step()
+    yield
+
+def grid_lines(ax, nrows, ncols, animated=False):
+    """ cell borders (on small grids, one collection) and axis limits of an nrows x ncols grid image """
+    ax.set_xlim(-0.5, ncols-0.5)
+    ax.set_ylim(nrows-0.5, -0.5)
+    if nrows*ncols > LINES_MAX_CELLS: return None
+    rows, cols = np.arange(1, nrows)-0.5, np.arange(1, ncols)-0.5
+    segments = [[(-0.5, r), (ncols-0.5, r)] for r in rows]+[[(c, -0.5), (c, nrows-0.5)] for c in cols]
+    return ax.add_collection(LineCollection(segments, colors='gray', animated=animated))
+
+def arrow_templates(length=0.3, width=0.03):
+    """ outlines (A, 8, 2) of arrows from a cell center for up, down, left, right (as drawn by ax.arrow) """
+    head_width, head_length = 3*width, 4.5*width
+    right = np.array([[0, -width/2], [length, -width/2], [length, -head_width/2], [length+head_length, 0],
+                      [length, head_width/2], [length, width/2], [0, width/2], [0, 0]])
+    return np.stack((right[:, ::-1]*[1, -1], right[:, ::-1], right*[-1, 1], right))
+
+class SolverThread(QThread):
+    """ runs the steps of a solve off the GUI thread and sends (values, policy) snapshots: at most one per
+        SNAPSHOT_INTERVAL, none while the GUI has not shown the last one yet, and always one at the end """
+    snapshot = pyqtSignal(object, object)
+
+    def __init__(self, solver, steps):
+        super(SolverThread, self).__init__()
+        self.solver, self.steps = solver, steps
+        self.shown = True
+
+    def run(self):
+        sent = time.time()
+        for _ in self.steps:
+            if self.isInterruptionRequested(): break
+            if self.shown and time.time()-sent >= SNAPSHOT_INTERVAL:
+                self.send()
+                sent = time.time()
+        self.send()
+
+    def snapshot_shown(self, values, policy):
+        self.shown = True
+
+    def send(self):
+        """ copies, so the GUI never reads arrays the solve is writing """
+        self.shown = False
+        shape = self.solver.values.shape
+        self.snapshot.emit(np.array(self.solver.values, dtype=np.float64),
+                           np.array(self.solver.action_probabilities()).reshape(shape+(self.solver.nactions,)))
+
+class SolverView():
+    """ state values (image, and labels on small grids) and policy (arrows) of a solver on two axes:
+        the artists are created once, then updated in place and blitted over a cached background """
+
+    def __init__(self, canvas, values_ax, policy_ax, env):
+        self.canvas = canvas
+        nrows, ncols = env.nrows, env.ncols
+        ys, xs = np.mgrid[0:nrows, 0:ncols]
+        # state values
+        self.image = values_ax.imshow(np.zeros(shape=(nrows, ncols)), cmap=cm.PuBu, animated=True)
+        self.texts = [] if nrows*ncols > TEXT_MAX_CELLS else \
+            [values_ax.text(c, r, '', horizontalalignment='center', verticalalignment='center', fontsize=8, animated=True)
+             for r, c in zip(ys.reshape(-1), xs.reshape(-1))]
+        # policy: the arrows of all greedy actions as one compound path
+        policy_ax.imshow(np.zeros(shape=(nrows, ncols)), cmap=cm.binary)
+        self.centers = np.stack((xs.reshape(-1), ys.reshape(-1)), axis=1).astype(np.float64)
+        self.templates = arrow_templates()
+        self.codes = np.array([Path.MOVETO]+[Path.LINETO]*6+[Path.CLOSEPOLY])
+        self.arrows = policy_ax.add_patch(PathPatch(Path(np.zeros((0, 2))), fc='k', lw=0, animated=True))
+        borders = grid_lines(values_ax, nrows, ncols, animated=True)     # over the (animated) value image
+        grid_lines(policy_ax, nrows, ncols)
+        self.artists = [self.image]+([] if borders is None else [borders])+self.texts+[self.arrows]
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.mpl_connect('resize_event', self.on_resize)
+
+    def update(self, values, policy):
+        """ show values (nrows, ncols) and policy (nrows, ncols, A) """
+        self.values, self.policy = values, policy
+        self.image.set_data(values)
+        self.image.set_clim(np.min(values), np.max(values))
+        for text, value in zip(self.texts, values.reshape(-1)): text.set_text("%.2f"%value)
+        states, actions = np.nonzero(policy.reshape(len(self.centers), -1) > 0)
+        vertices = self.centers[states, None, :]+self.templates[actions]
+        self.arrows.set_path(Path(vertices.reshape(-1, 2), np.tile(self.codes, len(states))))
+        self.blit()
+
+    def on_draw(self, event):
+        """ a full redraw (first show, resize): cache the static background, then draw the artists on it """
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        for artist in self.artists: artist.draw(event.renderer)
+
+    def on_resize(self, event):
+        """ the cached background has the old size: redraw in full until the next draw caches a new one """
+        self.background = None
+
+    def blit(self):
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        for artist in self.artists: artist.axes.draw_artist(artist)
+        self.canvas.blit(self.canvas.figure.bbox)
 
 class Demo(QWidget):
     """ a demo class, implemented with PyQt5 """
@@ -27,21 +158,20 @@ class Demo(QWidget):
         self.env = env
         self.env_label = self.YaheiLabel('Grid World', 4)
         # environment figure
-        self.env_matrix = np.zeros(shape=(env.nrows, env.ncols))
-        self.env_matrix[0][0], self.env_matrix[env.nrows-1][env.ncols-1] = 1, 1    # destination
+        self.env_matrix = env.goals + 0.5*env.blocked       # destinations black, blocked cells gray
         self.env_figure = plt.figure()
         self.env_canvas = FigureCanvas(self.env_figure)
         self.env_ax = self.env_figure.add_subplot(111)
-        self.env_ax.imshow(self.env_matrix, cmap=cm.binary)
-        for r in range(env.nrows-1): self.env_ax.plot([-0.5, 7.5], [r+0.5, r+0.5], c='gray')
-        for c in range(env.ncols-1): self.env_ax.plot([c+0.5, c+0.5], [-0.5, 7.5], c='gray')
+        self.env_ax.imshow(self.env_matrix, cmap=cm.binary, vmin=0, vmax=1)
+        grid_lines(self.env_ax, env.nrows, env.ncols)
         self.env_canvas.draw()
         # environment description
+        goals = [(x, y) for y, x in zip(*np.nonzero(env.goals))]
         self.env_text = QLabel(self)
         self.env_text.setWordWrap(True)
         self.env_text.setText('Size\t:   %dx%d\n\n'%(env.nrows, env.ncols) + \
                               'Start\t:   random\n' + \
-                              'End\t:   (0,0) or (%d,%d)\n\n'%(env.ncols-1, env.nrows-1) + \
+                              'End\t:   %s\n\n'%(' or '.join('(%d,%d)'%goal for goal in goals) if len(goals) <= 4 else '%d cells'%len(goals)) + \
                               'State\t:   position coordinates\n' + \
                               'Action\t:   {Up, Down, Left, Right}\n' + \
                               'Reward\t:   r=-1 for each step\n' + \
@@ -66,21 +196,26 @@ class Demo(QWidget):
         self.PI_button4.clicked.connect(self.policy_iteration)
         self.PI_button5 = QPushButton('Save Figure')
         self.PI_button5.clicked.connect(lambda: self.figure_save(self.PI_values_figure))
+        self.PI_button6 = QPushButton('Stop')
+        self.PI_button6.clicked.connect(lambda: self.stop_solver(self.PI_thread))
         # layout of buttons
         self.PI_button_layout = QHBoxLayout()
         self.PI_button_layout.addWidget(self.PI_button1)
         self.PI_button_layout.addWidget(self.PI_button2)
         self.PI_button_layout.addWidget(self.PI_button3)
         self.PI_button_layout.addWidget(self.PI_button4)
+        self.PI_button_layout.addWidget(self.PI_button6)
         self.PI_button_layout.addWidget(self.PI_button5)
-        # figure of state values
-        self.PI = PolicyIteration(env)
+        self.PI_solve_buttons = [self.PI_button1, self.PI_button2, self.PI_button3, self.PI_button4]
+        # figure of state values ('auto': exact evaluation, sweeps are too slow for large grids)
+        self.PI = PolicyIteration(env, evaluation='auto')
+        self.PI_thread = None
         self.PI_values_figure = plt.figure()
         self.PI_values_canvas = FigureCanvas(self.PI_values_figure)
         self.PI_values_ax = self.PI_values_figure.add_subplot(121)
         self.PI_policy_ax = self.PI_values_figure.add_subplot(122)
-        self.show_state_value(self.PI_values_ax, self.PI.values)
-        self.show_policy(self.PI_policy_ax, self.PI.policy)
+        self.PI_view = SolverView(self.PI_values_canvas, self.PI_values_ax, self.PI_policy_ax, env)
+        self.PI_view.update(np.array(self.PI.values), self.PI.action_probabilities().reshape(self.PI.policy.shape))
         self.PI_values_canvas.draw()
         # layout of values demo
         self.PI_values_layout = QVBoxLayout()
@@ -92,14 +227,13 @@ class Demo(QWidget):
         self.PI_dp_figure = plt.figure()
         self.PI_dp_canvas = FigureCanvas(self.PI_dp_figure)
         self.PI_dp_ax = self.PI_dp_figure.add_subplot(111)
-        self.PI_dp_ax.imshow(self.env_matrix, cmap=cm.binary)
-        for r in range(self.PI_dp_env.nrows-1): self.PI_dp_ax.plot([-0.5, 7.5], [r+0.5, r+0.5], c='gray')
-        for c in range(self.PI_dp_env.ncols-1): self.PI_dp_ax.plot([c+0.5, c+0.5], [-0.5, 7.5], c='gray')
-        self.PI_dp_ax.scatter([self.PI_dp_env.get_state()[0]], [self.PI_dp_env.get_state()[1]], marker='*', s=144, c='lightcoral')
+        self.PI_dp_ax.imshow(self.env_matrix, cmap=cm.binary, vmin=0, vmax=1)
+        grid_lines(self.PI_dp_ax, self.PI_dp_env.nrows, self.PI_dp_env.ncols)
+        self.PI_dp_agent = self.PI_dp_ax.scatter([self.PI_dp_env.get_state()[0]], [self.PI_dp_env.get_state()[1]], marker='*', s=144, c='lightcoral')
         self.PI_dp_canvas.draw()
         self.PI_dp_timer = QTimer(self)
         self.PI_dp_timer.timeout.connect(lambda: self.decision_making_demo(
-            self.PI_dp_env, self.PI.policy, self.PI_dp_ax, self.PI_dp_canvas))
+            self.PI_dp_env, self.PI_view.policy, self.PI_dp_agent, self.PI_dp_canvas))
         # button of DP (decision process) demo
         self.PI_dp_button_start = QPushButton('Start: Decision Process')
         self.PI_dp_button_start.clicked.connect(lambda: self.PI_dp_timer.start(1000))
@@ -132,20 +266,25 @@ class Demo(QWidget):
         self.VI_button3.clicked.connect(self.value_iteration)
         self.VI_button4 = QPushButton('Save Figure')
         self.VI_button4.clicked.connect(lambda: self.figure_save(self.VI_values_figure))
+        self.VI_button5 = QPushButton('Stop')
+        self.VI_button5.clicked.connect(lambda: self.stop_solver(self.VI_thread))
         # layout of buttons
         self.VI_button_layout = QHBoxLayout()
         self.VI_button_layout.addWidget(self.VI_button1)
         self.VI_button_layout.addWidget(self.VI_button2)
         self.VI_button_layout.addWidget(self.VI_button3)
+        self.VI_button_layout.addWidget(self.VI_button5)
         self.VI_button_layout.addWidget(self.VI_button4)
+        self.VI_solve_buttons = [self.VI_button1, self.VI_button2, self.VI_button3]
         # figure of state values
         self.VI = ValueIteration(env)
+        self.VI_thread = None
         self.VI_values_figure = plt.figure()
         self.VI_values_canvas = FigureCanvas(self.VI_values_figure)
         self.VI_values_ax = self.VI_values_figure.add_subplot(121)
         self.VI_policy_ax = self.VI_values_figure.add_subplot(122)
-        self.show_state_value(self.VI_values_ax, self.VI.values)
-        self.show_policy(self.VI_policy_ax, self.VI.policy)
+        self.VI_view = SolverView(self.VI_values_canvas, self.VI_values_ax, self.VI_policy_ax, env)
+        self.VI_view.update(np.array(self.VI.values), self.VI.action_probabilities().reshape(self.VI.policy.shape))
         self.VI_values_canvas.draw()
         # layout of values demo
         self.VI_values_layout = QVBoxLayout()
@@ -157,14 +296,13 @@ class Demo(QWidget):
         self.VI_dp_figure = plt.figure()
         self.VI_dp_canvas = FigureCanvas(self.VI_dp_figure)
         self.VI_dp_ax = self.VI_dp_figure.add_subplot(111)
-        self.VI_dp_ax.imshow(self.env_matrix, cmap=cm.binary)
-        for r in range(self.VI_dp_env.nrows-1): self.VI_dp_ax.plot([-0.5, 7.5], [r+0.5, r+0.5], c='gray')
-        for c in range(self.VI_dp_env.ncols-1): self.VI_dp_ax.plot([c+0.5, c+0.5], [-0.5, 7.5], c='gray')
-        self.VI_dp_ax.scatter([self.VI_dp_env.get_state()[0]], [self.VI_dp_env.get_state()[1]], marker='*', s=144, c='lightcoral')
+        self.VI_dp_ax.imshow(self.env_matrix, cmap=cm.binary, vmin=0, vmax=1)
+        grid_lines(self.VI_dp_ax, self.VI_dp_env.nrows, self.VI_dp_env.ncols)
+        self.VI_dp_agent = self.VI_dp_ax.scatter([self.VI_dp_env.get_state()[0]], [self.VI_dp_env.get_state()[1]], marker='*', s=144, c='lightcoral')
         self.VI_dp_canvas.draw()
         self.VI_dp_timer = QTimer(self)
         self.VI_dp_timer.timeout.connect(lambda: self.decision_making_demo(
-            self.VI_dp_env, self.VI.policy, self.VI_dp_ax, self.VI_dp_canvas))
+            self.VI_dp_env, self.VI_view.policy, self.VI_dp_agent, self.VI_dp_canvas))
         # button of DP (decision process) demo
         self.VI_dp_button_start = QPushButton('Start: Decision Process')
         self.VI_dp_button_start.clicked.connect(lambda: self.VI_dp_timer.start(1000))
@@ -210,99 +348,60 @@ class Demo(QWidget):
         """ QLabel with font Microsoft Yahei """
         return QLabel('<h%d style="font-family:Microsoft Yahei">%s</h%d>'%(size, text, size), self)
 
+    def run_solver(self, solver, steps, view, buttons):
+        """ run steps of solver on a worker thread, showing its snapshots in view;
+            buttons that start or reset a solve are disabled until it is done """
+        thread = SolverThread(solver, steps)
+        thread.snapshot.connect(view.update)            # queued: runs on the GUI thread
+        thread.snapshot.connect(thread.snapshot_shown)
+        thread.finished.connect(lambda: [button.setEnabled(True) for button in buttons])
+        for button in buttons: button.setEnabled(False)
+        thread.start()
+        return thread
+
+    def stop_solver(self, thread):
+        if thread is not None: thread.requestInterruption()
+
     def policy_evaluation(self):
-        self.PI.policy_evaluation()
-        self.PI_values_ax.cla()
-        self.show_state_value(self.PI_values_ax, self.PI.values)
-        self.PI_values_canvas.draw()
+        self.PI_thread = self.run_solver(self.PI, single_step(self.PI.policy_evaluation), self.PI_view, self.PI_solve_buttons)
 
     def policy_improvement(self):
-        self.PI.policy_improvement()
-        self.PI_policy_ax.cla()
-        self.show_policy(self.PI_policy_ax, self.PI.policy)
-        self.PI_values_canvas.draw()
+        self.PI_thread = self.run_solver(self.PI, single_step(self.PI.policy_improvement), self.PI_view, self.PI_solve_buttons)
 
     def policy_iteration(self):
-        self.PI.policy_iteration()
-        self.PI_values_ax.cla()
-        self.PI_policy_ax.cla()
-        self.show_state_value(self.PI_values_ax, self.PI.values)
-        self.show_policy(self.PI_policy_ax, self.PI.policy)
-        self.PI_values_canvas.draw()
+        self.PI_thread = self.run_solver(self.PI, policy_iteration_steps(self.PI), self.PI_view, self.PI_solve_buttons)
 
     def policy_iteration_reset(self):
-        self.PI.reset()
-        self.PI_values_ax.cla()
-        self.PI_policy_ax.cla()
-        self.show_state_value(self.PI_values_ax, self.PI.values)
-        self.show_policy(self.PI_policy_ax, self.PI.policy)
-        self.PI_values_canvas.draw()
+        self.PI_thread = self.run_solver(self.PI, single_step(self.PI.reset), self.PI_view, self.PI_solve_buttons)
 
     def value_iteration_step(self):
-        self.VI.value_iteration_step()
-        self.VI_values_ax.cla()
-        self.VI_policy_ax.cla()
-        self.show_state_value(self.VI_values_ax, self.VI.values)
-        self.show_policy(self.VI_policy_ax, self.VI.policy)
-        self.VI_values_canvas.draw()
+        self.VI_thread = self.run_solver(self.VI, single_step(self.VI.value_iteration_step), self.VI_view, self.VI_solve_buttons)
 
     def value_iteration(self):
-        self.VI.value_iteration()
-        self.VI_values_ax.cla()
-        self.VI_policy_ax.cla()
-        self.show_state_value(self.VI_values_ax, self.VI.values)
-        self.show_policy(self.VI_policy_ax, self.VI.policy)
-        self.VI_values_canvas.draw()
+        self.VI_thread = self.run_solver(self.VI, value_iteration_steps(self.VI), self.VI_view, self.VI_solve_buttons)
 
     def value_iteration_reset(self):
-        self.VI.reset()
-        self.VI_values_ax.cla()
-        self.VI_policy_ax.cla()
-        self.show_state_value(self.VI_values_ax, self.VI.values)
-        self.show_policy(self.VI_policy_ax, self.VI.policy)
-        self.VI_values_canvas.draw()
-
-    def show_state_value(self, ax, values):
-        """ show value of each state """
-        ax.imshow(values, cmap=cm.PuBu)
-        for r in range(env.nrows-1): ax.plot([-0.5, 7.5], [r+0.5, r+0.5], c='gray')
-        for c in range(env.ncols-1): ax.plot([c+0.5, c+0.5], [-0.5, 7.5], c='gray')
-        for r in range(env.nrows):
-            for c in range(env.ncols): ax.text(c, r, "%.2f"%values[r][c],
-                horizontalalignment='center', verticalalignment='center', fontsize=8)
-
-    def show_policy(self, ax, policy):
-        """ show policy in each state """
-        ax.imshow(np.zeros(shape=(env.nrows, env.ncols)), cmap=cm.binary)
-        for r in range(env.nrows):
-            for c in range(env.ncols):
-                if policy[r][c][0] > 0: ax.arrow(c, r, 0, -0.3, width=0.03, fc='k', ec='k')     # up
-                if policy[r][c][1] > 0: ax.arrow(c, r, 0, 0.3, width=0.03, fc='k', ec='k')      # down
-                if policy[r][c][2] > 0: ax.arrow(c, r, -0.3, 0, width=0.03, fc='k', ec='k')     # left
-                if policy[r][c][3] > 0: ax.arrow(c, r, 0.3, 0, width=0.03, fc='k', ec='k')      # right
-        for r in range(env.nrows-1): ax.plot([-0.5, 7.5], [r+0.5, r+0.5], c='gray')
-        for c in range(env.ncols-1): ax.plot([c+0.5, c+0.5], [-0.5, 7.5], c='gray')
-        ax.axis([-0.5, 7.5, -0.5, 7.5])
-        ax.invert_yaxis()
+        self.VI_thread = self.run_solver(self.VI, single_step(self.VI.reset), self.VI_view, self.VI_solve_buttons)
 
     def figure_save(self, figure):
         filename, _ = QFileDialog.getSaveFileName(None, "Save Figure", "./")
+        if not filename: return
+        # a full draw first, so the saved figure shows the animated artists as they are now; saving at another
+        # dpi draws (and caches a background) at that dpi, so redraw the screen in full afterwards as well
+        figure.canvas.draw()
         figure.savefig(filename, dpi=500)
+        figure.canvas.draw()
 
-    def decision_making_demo(self, env, policy, ax, canvas):
-        """ one step of decision making """
+    def decision_making_demo(self, env, policy, agent, canvas):
+        """ one step of decision making (with the latest policy snapshot) """
         obs = env.get_state()
         action = np.random.choice(np.arange(env.nactions), p=policy[obs[1]][obs[0]])
         next_obs, reward, done = env.step(action)
         if done: env.reset()
 
         # demo
-        ax.cla()
-        ax.imshow(self.env_matrix, cmap=cm.binary)
-        for r in range(env.nrows-1): ax.plot([-0.5, 7.5], [r+0.5, r+0.5], c='gray')
-        for c in range(env.ncols-1): ax.plot([c+0.5, c+0.5], [-0.5, 7.5], c='gray')
-        ax.scatter([env.get_state()[0]], [env.get_state()[1]], marker='*', s=144, c='lightcoral')
-        canvas.draw()
+        agent.set_offsets([env.get_state()])
+        canvas.draw_idle()
 
 def main(env):
     app = QApplication(sys.argv)
@@ -311,5 +410,7 @@ def main(env):
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
-    env = GridEnv(nrows=8, ncols=8)
-    main(env)
\ No newline at end of file
+    # python demo.py [nrows ncols]
+    nrows, ncols = (int(sys.argv[1]), int(sys.argv[2])) if len(sys.argv) > 2 else (8, 8)
+    env = GridEnv(nrows=nrows, ncols=ncols)
+    main(env)
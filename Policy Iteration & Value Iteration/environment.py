@@ -2,19 +2,24 @@ import copy
 import numpy as np
 
 class GridEnv():
-    """ a class of Grid-World environment 
-        (RxC, destination: (0, 0)/(C-1, R-1), no obstacles) """
+    """ a class of Grid-World environment
+        (RxC, destination: (0, 0)/(C-1, R-1) unless goals are given, optional blocked cells) """
 
-    def __init__(self, nrows, ncols):
+    def __init__(self, nrows, ncols, goals=None, blocked=()):
         self.nrows = nrows
         self.ncols = ncols
         self.nactions = 4   # up, down, left, right
+        # goals and blocked cells as (nrows, ncols) masks, cells given as (x, y)
+        self.goals = np.zeros(shape=(nrows, ncols), dtype=bool)
+        self.blocked = np.zeros(shape=(nrows, ncols), dtype=bool)
+        self.set_goals([(0, 0), (ncols-1, nrows-1)] if goals is None else goals)
+        self.set_blocked(blocked)
         self.reset()
 
     def reset(self):
         """ set initial position in Grid-World """
         self.pos = np.array([np.random.randint(self.ncols), np.random.randint(self.nrows)])
-        while self.isDone(self.pos):
+        while self.isDone(self.pos) or self.blocked[self.pos[1], self.pos[0]]:
             self.pos = np.array([np.random.randint(self.ncols), np.random.randint(self.nrows)])
 
     def get_state(self):
@@ -28,10 +33,69 @@ class GridEnv():
         states = np.concatenate((xs.reshape(-1, 1), ys.reshape(-1, 1)), axis=1)
         return states
 
+    def state_index(self, state):
+        """ flat index of a position, row-major: s = y*ncols + x """
+        return state[1]*self.ncols + state[0]
+
+    def set_goals(self, cells):
+        """ replace the destinations, return flat indices of the cells that changed """
+        goals = np.zeros_like(self.goals)
+        for x, y in cells: goals[y, x] = True
+        changed = np.flatnonzero(goals != self.goals)
+        self.goals = goals
+        return changed
+
+    def set_blocked(self, cells, blocked=True):
+        """ block (or unblock) cells, return flat indices of the cells that changed """
+        cells = np.array(list(cells), dtype=np.int64).reshape(-1, 2)
+        changed = cells[self.blocked[cells[:, 1], cells[:, 0]] != blocked]
+        self.blocked[changed[:, 1], changed[:, 0]] = blocked
+        return np.unique(changed[:, 1]*self.ncols + changed[:, 0])
+
+    def neighbourhood(self, states):
+        """ flat states and their 4 neighbours: the states whose moves change when states change """
+        states = np.asarray(states, dtype=np.int64)
+        ys, xs = states//self.ncols, states%self.ncols
+        ys = np.concatenate((ys, np.maximum(ys-1, 0), np.minimum(ys+1, self.nrows-1), ys, ys))
+        xs = np.concatenate((xs, xs, xs, np.maximum(xs-1, 0), np.minimum(xs+1, self.ncols-1)))
+        return np.unique(ys*self.ncols + xs)
+
+    def tabular(self, states=None):
+        """ compiled tabular model over flat state indices (all, or only states):
+            next_states (S, A) int, rewards (S, A) float, terminal (S,) bool
+            (goals and blocked cells are absorbing with reward 0, moves into blocked cells stay put) """
+        states = np.arange(self.nrows*self.ncols) if states is None else np.asarray(states, dtype=np.int64)
+        xs, ys = states%self.ncols, states//self.ncols
+        # action: 0 -- up, 1 -- down, 2 -- left, 3 -- right
+        next_states = np.stack((np.maximum(ys-1, 0)*self.ncols + xs,
+                                np.minimum(ys+1, self.nrows-1)*self.ncols + xs,
+                                ys*self.ncols + np.maximum(xs-1, 0),
+                                ys*self.ncols + np.minimum(xs+1, self.ncols-1)), axis=1)
+        next_states = np.where(self.blocked.reshape(-1)[next_states], states[:, None], next_states)
+        terminal = self.goals.reshape(-1)[states] | self.blocked.reshape(-1)[states]
+        next_states[terminal] = states[terminal, None]
+        rewards = np.full((len(states), self.nactions), -1.0)                       # reward = -1
+        rewards[terminal] = 0
+        return next_states, rewards, terminal
+
+    def coarsen(self, row_step, col_step):
+        """ grid of every row_step-th row and col_step-th column (corners kept), goals moved to the
+            nearest coarse cell, a coarse cell blocked when all fine cells around it are blocked """
+        nrows, ncols = (self.nrows-1)//row_step+1, (self.ncols-1)//col_step+1
+        ys, xs = np.nonzero(self.goals)
+        goals = set(zip(np.round(xs/col_step).astype(int).tolist(), np.round(ys/row_step).astype(int).tolist()))
+        rows = np.minimum(np.arange(nrows)*row_step, self.nrows-1)
+        cols = np.minimum(np.arange(ncols)*col_step, self.ncols-1)
+        blocked = self.blocked[rows][:, cols]
+        for dy in range(-(row_step//2), row_step//2+1):
+            for dx in range(-(col_step//2), col_step//2+1):
+                blocked &= self.blocked[np.clip(rows+dy, 0, self.nrows-1)][:, np.clip(cols+dx, 0, self.ncols-1)]
+        ys, xs = np.nonzero(blocked)
+        return GridEnv(nrows, ncols, goals=goals, blocked=list(zip(xs.tolist(), ys.tolist())))
+
     def isDone(self, state):
         """ done = True when reached destination """
-        return (state == np.array([0, 0])).all() or \
-               (state == np.array([self.ncols-1, self.nrows-1])).all()
+        return bool(self.goals[state[1], state[0]])
 
     def transition(self, state, action):
         """ action: 0 -- up, 1 -- down, 2 -- left, 3 -- right """
@@ -41,8 +105,10 @@ class GridEnv():
         elif action == 1 and next_state[1] < self.nrows - 1: next_state[1] += 1
         elif action == 2 and next_state[0] > 0: next_state[0] -= 1
         elif action == 3 and next_state[0] < self.ncols - 1: next_state[0] += 1
+        if self.blocked[next_state[1], next_state[0]]: next_state = copy.deepcopy(state)
         return next_state, -1, self.isDone(next_state)  # reward = -1
 
     def step(self, action):
+        """ move from the current position (moves off the grid or into blocked cells stay put) """
         self.pos, reward, done = self.transition(self.pos, action)
         return self.pos, reward, done
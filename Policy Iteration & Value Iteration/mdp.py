@@ -0,0 +1,260 @@
+import heapq
+import numpy as np
+
+# scipy.sparse is imported where matrices are built, so importing the solvers stays cheap
+
+TIE_TOLERANCE = 1e-9            # relative gap under which action values count as tied (solver round-off)
+VALUE_TOLERANCE = 1e-9          # default stopping tolerance of value iteration (max change of a sweep)
+BLOCK_STATES = 1 << 20          # compact solves back up this many states at a time
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)    # set bits of each uint8
+
+class TabularMDP():
+    """ a finite MDP stored as sparse matrices:
+        P (S*A, S) CSR with row s*A+a holding P(s'|s,a), rewards (S, A) expected rewards,
+        terminal (S,) bool (terminal states keep value 0), shape of the value array """
+
+    def __init__(self, P, rewards, terminal=None, shape=None):
+        from scipy import sparse
+        self.rewards = np.asarray(rewards, dtype=np.float64)
+        self.nstates, self.nactions = self.rewards.shape
+        self.P = sparse.csr_matrix(P)
+        assert self.P.shape == (self.nstates*self.nactions, self.nstates), "P must be (S*A, S)"
+        self.P.sum_duplicates()
+        self.terminal = np.zeros(self.nstates, dtype=bool) if terminal is None else np.asarray(terminal, dtype=bool)
+        self.shape = (self.nstates,) if shape is None else tuple(shape)
+        self.reverse = None             # predecessor index, built on first use
+
+    @classmethod
+    def from_grid(cls, env, slip=0.0):
+        """ MDP of a GridEnv; with slip > 0 the agent moves in a uniformly random direction
+            with probability slip instead of the chosen one (slippery grid) """
+        next_states, rewards, terminal = env.tabular()
+        mdp = cls(grid_transitions(next_states, len(next_states), slip), rewards, terminal, shape=(env.nrows, env.ncols))
+        mdp.slip = slip
+        return mdp
+
+    def update_grid(self, env, cells, values, gamma, tol=1e-9):
+        """ after a GridEnv edit of flat states cells, rebuild the rows of the cells and their neighbours and
+            re-solve values (a converged solution of the old grid) from there by prioritized sweeping.
+            Returns the states touched (rebuilt, reset or backed up) and the number of backups """
+        values = values.reshape(-1)
+        states = env.neighbourhood(cells)
+        # values that relied on the edited cells may get worse: restart them from a lower bound
+        # (raising a too-low value takes one backup, lowering a too-high one takes many)
+        reset = self.dependents(values, gamma, np.asarray(cells, dtype=np.int64))
+        next_states, rewards, terminal = env.tabular(states)
+        self.update_rows(states, grid_transitions(next_states, self.nstates, getattr(self, 'slip', 0.0)), rewards, terminal)
+        reset = np.union1d(reset, states[self.terminal[states]])
+        values[reset] = min(np.min(self.rewards), 0)*(self.nstates if gamma == 1 else 1/(1-gamma))
+        values[reset[self.terminal[reset]]] = 0
+        touched = set()
+        backups = self.prioritized_sweeping(values, gamma, tol, states=np.union1d(states, reset), touched=touched)
+        return np.union1d(np.union1d(states, reset), np.fromiter(touched, dtype=np.int64, count=len(touched))), backups
+
+    def dependents(self, values, gamma, states):
+        """ states together with every state all of whose greedy actions (under values) can lead into them """
+        marked = np.zeros(self.nstates, dtype=bool)
+        marked[states] = True
+        found, frontier = [states], states
+        while len(frontier):
+            candidates = self.predecessors(frontier)
+            candidates = candidates[~marked[candidates] & ~self.terminal[candidates]]
+            if not len(candidates): break
+            action_values = self.action_values(values, gamma, candidates)
+            max_action_values = np.max(action_values, axis=1, keepdims=True)
+            greedy = action_values >= max_action_values-TIE_TOLERANCE*(1+np.abs(max_action_values))
+            rows = self.P[(candidates[:, None]*self.nactions + np.arange(self.nactions)).reshape(-1)]
+            hits = reduce_rows(np.logical_or, marked[rows.indices], rows.indptr)
+            frontier = candidates[np.all(~greedy | hits.reshape(-1, self.nactions), axis=1)]
+            marked[frontier] = True
+            found.append(frontier)
+        return np.unique(np.concatenate(found))
+
+    def update_rows(self, states, P_rows, rewards, terminal):
+        """ replace transitions (len(states)*A, S), rewards and terminal flags of sorted unique states """
+        from scipy import sparse
+        P_rows = sparse.csr_matrix(P_rows)
+        rows = (states[:, None]*self.nactions + np.arange(self.nactions)).reshape(-1)
+        lengths = self.P.indptr[rows+1]-self.P.indptr[rows]
+        if np.array_equal(lengths, np.diff(P_rows.indptr)):
+            # same number of successors in every row: overwrite in place
+            positions = np.arange(P_rows.nnz) + np.repeat(self.P.indptr[rows]-P_rows.indptr[:-1], lengths)
+            self.P.data[positions], self.P.indices[positions] = P_rows.data, P_rows.indices
+            self.P.has_sorted_indices = False
+        else:
+            old, new = self.P.tocoo(), P_rows.tocoo()
+            kept = np.ones(self.P.shape[0], dtype=bool)
+            kept[rows] = False
+            kept = kept[old.row]
+            self.P = sparse.csr_matrix((np.concatenate((old.data[kept], new.data)),
+                                        (np.concatenate((old.row[kept], rows[new.row])), np.concatenate((old.col[kept], new.col)))),
+                                       shape=self.P.shape)
+        self.rewards[states], self.terminal[states] = rewards, terminal
+        if self.reverse is not None:
+            # drop the predecessor entries of the changed states and add their new ones
+            old, new = self.reverse.tocoo(), predecessor_index(P_rows, states, self.nstates).tocoo()
+            kept = ~np.isin(old.col, states)
+            self.reverse = sparse.csr_matrix((np.concatenate((old.data[kept], new.data)),
+                                              (np.concatenate((old.row[kept], new.row)), np.concatenate((old.col[kept], new.col)))),
+                                             shape=self.reverse.shape)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(f, data=self.P.data, indices=self.P.indices, indptr=self.P.indptr,
+                     rewards=self.rewards, terminal=self.terminal, shape=np.array(self.shape))
+
+    @classmethod
+    def load(cls, path):
+        """ MDP from an npz of CSR arrays (data, indices, indptr), rewards (S, A) and optionally terminal, shape """
+        from scipy import sparse
+        data = np.load(path)
+        rewards = data['rewards']
+        P = sparse.csr_matrix((data['data'], data['indices'], data['indptr']), shape=(rewards.size, len(rewards)))
+        terminal = data['terminal'] if 'terminal' in data else None
+        shape = data['shape'].tolist() if 'shape' in data else None
+        return cls(P, rewards, terminal, shape)
+
+    def action_values(self, values, gamma, states=None):
+        """ Bellman backup of all (s, a): r(s,a) + γ Σ P(s'|s,a) v(s') as an (S, A) array
+            (or only of states, an index array or a slice of consecutive states) """
+        if states is None: return self.rewards+gamma*(self.P @ values.reshape(-1)).reshape(self.nstates, self.nactions)
+        if isinstance(states, slice):
+            start, stop, _ = states.indices(self.nstates)
+            P = row_block(self.P, start*self.nactions, stop*self.nactions)
+            return self.rewards[start:stop]+gamma*(P @ values.reshape(-1)).reshape(-1, self.nactions)
+        rows = (states[:, None]*self.nactions + np.arange(self.nactions)).reshape(-1)
+        return self.rewards[states]+gamma*(self.P[rows] @ values.reshape(-1)).reshape(-1, self.nactions)
+
+    def policy_matrix(self, policy):
+        """ sparse transition matrix P_π (S, S) and expected rewards r_π (S,) of policy (S, A), or of a
+            uint8 bitmask (S,) of greedy actions (uniform over them), built from its set bits without
+            unpacking it to probabilities """
+        from scipy import sparse
+        if policy.dtype == np.uint8:
+            bits = policy.reshape(-1)
+            counts = POPCOUNT[bits]
+            scale = 1.0/np.maximum(counts, 1)
+            # row s of the (S, S*A) weights holds 1/count at the flat (s, a) of each greedy action a
+            indices = np.flatnonzero(np.unpackbits(bits[:, None], axis=1, count=self.nactions, bitorder='little'))
+            indptr = np.concatenate(([0], np.cumsum(counts)))
+            index_dtype = np.int32 if self.P.shape[0] < 2**31 else np.int64     # holds the S*A columns
+            W = sparse.csr_matrix((np.repeat(scale, counts), indices.astype(index_dtype), indptr.astype(index_dtype)),
+                                  shape=(self.nstates, bits.size*self.nactions))
+            del indices, indptr
+            P = (W @ self.P).tocsr()
+            P.eliminate_zeros()
+            r = sum(self.rewards[:, a]*((bits >> a) & 1) for a in range(self.nactions))
+            return P, r*scale
+        policy = policy.reshape(self.nstates, self.nactions)
+        weights = sparse.csr_matrix((policy.reshape(-1), np.arange(policy.size), np.arange(0, policy.size+1, self.nactions)),
+                                    shape=(self.nstates, policy.size))
+        P = (weights @ self.P).tocsr()
+        P.eliminate_zeros()
+        return P, np.sum(policy*self.rewards, axis=1)
+
+    def is_proper(self, policy):
+        """ whether policy (as for policy_matrix) ends the episode with positive probability from every state:
+            a terminal state, or a row whose P_π mass is below 1, is reachable along its transitions """
+        from scipy import sparse
+        from scipy.sparse import csgraph
+        P = self.policy_matrix(policy)[0].tocoo()
+        ends = np.flatnonzero(self.terminal | (np.asarray(P.sum(axis=1)).reshape(-1) < 1-1e-12))
+        # reversed transitions s' -> s, and a root (state S) with an edge to every state that ends the episode
+        n = self.nstates
+        G = sparse.csr_matrix((np.ones(P.nnz+len(ends)), (np.r_[P.col, np.full(len(ends), n)], np.r_[P.row, ends])),
+                              shape=(n+1, n+1))
+        return len(csgraph.breadth_first_order(G, n, directed=True, return_predecessors=False)) == n+1
+
+    def reverse_index(self):
+        """ predecessors of every state as CSR (S, S): row s' holds p with weight max_a P(s'|p,a) """
+        if self.reverse is None: self.reverse = predecessor_index(self.P, np.arange(self.nstates), self.nstates)
+        return self.reverse
+
+    def predecessors(self, states):
+        """ states with a transition into any of states """
+        reverse = self.reverse_index()
+        return np.unique(reverse[states].indices)
+
+    def prioritized_sweeping(self, values, gamma, tol=1e-6, states=None, max_backups=None, touched=None):
+        """ asynchronous value iteration: back up states in order of a priority that bounds their Bellman error,
+            starting from the exact errors of states (default: all), and push the predecessors of changed states.
+            Stops when no bound exceeds tol (so the Bellman error is <= tol everywhere) or after max_backups.
+            values (flat) is updated in place, backed-up states are added to the set touched;
+            returns the number of backups """
+        values = values.reshape(-1)
+        reverse = self.reverse_index()
+        P, rewards, terminal, nactions = self.P, self.rewards, self.terminal, self.nactions
+        states = np.arange(self.nstates) if states is None else np.unique(states)
+        states = states[~terminal[states]]
+        errors = np.zeros(self.nstates)                 # upper bound on the Bellman error of each state
+        if len(states): errors[states] = np.abs(np.max(self.action_values(values, gamma, states), axis=1)-values[states])
+        heap = [(-errors[s], s) for s in states[errors[states] > tol].tolist()]
+        heapq.heapify(heap)
+        backups = 0
+        while heap and (max_backups is None or backups < max_backups):
+            priority, s = heapq.heappop(heap)
+            if -priority != errors[s]: continue         # stale entry, the state was pushed again or backed up
+            lo, hi = P.indptr[s*nactions], P.indptr[(s+1)*nactions]
+            action_values = rewards[s]+gamma*reduce_rows(np.add, P.data[lo:hi]*values[P.indices[lo:hi]],
+                                                         P.indptr[s*nactions:(s+1)*nactions+1])
+            old_value = values[s]
+            values[s], errors[s] = np.max(action_values), 0.0
+            change = abs(values[s]-old_value)           # as stored (float32 values round)
+            backups += 1
+            if touched is not None: touched.add(s)
+            if change == 0: continue
+            for p, weight in zip(reverse.indices[reverse.indptr[s]:reverse.indptr[s+1]].tolist(),
+                                 reverse.data[reverse.indptr[s]:reverse.indptr[s+1]].tolist()):
+                if terminal[p]: continue
+                errors[p] += gamma*weight*change        # Bellman error of p grows by at most this much
+                if errors[p] > tol: heapq.heappush(heap, (-errors[p], p))
+        return backups
+
+def reduce_rows(ufunc, data, indptr):
+    """ ufunc.reduceat of data over the CSR row segments indptr (data starting at indptr[0]), 0 / False for
+        empty rows (reduceat alone would return the next row's first element, or fail past the end) """
+    lengths = np.diff(indptr)
+    out = np.zeros(len(lengths), dtype=data.dtype)
+    nonempty = lengths > 0
+    if np.any(nonempty): out[nonempty] = ufunc.reduceat(data, indptr[:-1][nonempty]-indptr[0])
+    return out
+
+def row_block(P, start, stop):
+    """ rows start:stop of CSR P as a CSR view of its data and indices (P[start:stop] copies them) """
+    from scipy import sparse
+    begin, end = P.indptr[start], P.indptr[stop]
+    return sparse.csr_matrix((P.data[begin:end], P.indices[begin:end], P.indptr[start:stop+1]-begin),
+                             shape=(stop-start, P.shape[1]), copy=False)
+
+def pack_policy(greedy):
+    """ greedy action sets (..., A) bool (A <= 8) as a uint8 bitmask (...), bit a set when action a is greedy """
+    return np.packbits(greedy, axis=-1, bitorder='little')[..., 0]
+
+def unpack_policy(bits, nactions):
+    """ uint8 bitmask (...) of greedy actions as probabilities (..., A), uniform over the set (all 0 for none) """
+    greedy = np.unpackbits(bits[..., None], axis=-1, count=nactions, bitorder='little').astype(np.float64)
+    return greedy/np.maximum(np.sum(greedy, axis=-1, keepdims=True), 1)
+
+def grid_transitions(next_states, nstates, slip=0.0):
+    """ CSR rows (len(next_states)*A, nstates) of grid moves to next_states (n, A): the chosen move
+        with probability 1-slip, every move (the chosen one included) with slip/A """
+    from scipy import sparse
+    n, nactions = next_states.shape
+    rows = np.arange(n*nactions)
+    if slip == 0: return sparse.csr_matrix((np.ones(len(rows)), next_states.reshape(-1), np.arange(len(rows)+1)), shape=(len(rows), nstates))
+    slips = np.repeat(next_states, nactions, axis=0).reshape(-1)
+    return sparse.csr_matrix((np.concatenate((np.full(len(rows), 1-slip), np.full(len(slips), slip/nactions))),
+                              (np.concatenate((rows, np.repeat(rows, nactions))), np.concatenate((next_states.reshape(-1), slips)))),
+                             shape=(len(rows), nstates))
+
+def predecessor_index(P_rows, states, nstates):
+    """ CSR (S, S) with entry (s', p) = max_a P(s'|p,a) over transition rows P_rows (len(states)*A, S) of states """
+    from scipy import sparse
+    P_rows = P_rows.tocoo()
+    nactions = P_rows.shape[0]//max(len(states), 1)
+    keys = P_rows.col.astype(np.int64)*nstates + states[P_rows.row//nactions]
+    order = np.argsort(keys, kind='stable')
+    keys, weights = keys[order], P_rows.data[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+    keys, weights = keys[starts], np.maximum.reduceat(weights, starts) if len(keys) else weights
+    return sparse.csr_matrix((weights, (keys//nstates, keys%nstates)), shape=(nstates, nstates))
@@ -0,0 +1,77 @@
+import numpy as np
+
+from mdp import TabularMDP, VALUE_TOLERANCE
+
+def smallest_factor(n):
+    """ smallest divisor > 1 of n (1 if n < 2) """
+    for f in range(2, int(n**0.5)+1):
+        if n%f == 0: return f
+    return max(n, 1)
+
+def upsample(values, shape):
+    """ bilinear interpolation of a (r, c) value grid to shape (R, C), corners mapped onto corners """
+    rows, cols = values.shape
+    ys, xs = np.linspace(0, rows-1, shape[0]), np.linspace(0, cols-1, shape[1])
+    y0, x0 = np.clip(ys.astype(np.int64), 0, max(rows-2, 0)), np.clip(xs.astype(np.int64), 0, max(cols-2, 0))
+    y1, x1 = np.minimum(y0+1, rows-1), np.minimum(x0+1, cols-1)
+    wy, wx = (ys-y0)[:, None], (xs-x0)[None, :]
+    top = values[y0][:, x0]*(1-wx) + values[y0][:, x1]*wx
+    bottom = values[y1][:, x0]*(1-wx) + values[y1][:, x1]*wx
+    return np.ascontiguousarray(top*(1-wy) + bottom*wy)
+
+def level_mdp(env, gamma, row_step, col_step):
+    """ MDP of a coarse grid whose moves stand for row_step (up/down) or col_step (left/right) fine moves:
+        rewards summed with discount, discount γ^step folded into P (solve with γ=1) """
+    mdp = TabularMDP.from_grid(env)
+    steps = np.array([row_step, row_step, col_step, col_step])
+    costs = np.array([np.sum(gamma**np.arange(step)) for step in steps])
+    mdp.rewards *= costs
+    mdp.P.data *= np.tile(gamma**steps.astype(np.float64), mdp.nstates)    # one successor per (s, a)
+    return mdp
+
+def sweep_until(mdp, gamma, values, tol):
+    """ synchronous value iteration on flat values until the max change of a sweep is <= tol """
+    delta = np.inf
+    while delta > tol:
+        new_values = np.where(mdp.terminal, values, np.max(mdp.action_values(values, gamma), axis=1))
+        delta = np.max(np.abs(new_values-values))
+        values = new_values
+    return values
+
+def refine(coarse_values, shape, gamma):
+    """ fine start values from coarse ones, interpolated as step counts to the destination
+        (v = -(1-γ^d)/(1-γ) with reward -1, and d is piecewise linear over the grid) """
+    if gamma == 1: return upsample(coarse_values, shape)
+    steps = np.log(np.maximum(1+(1-gamma)*coarse_values, 1e-300))/np.log(gamma)
+    return -(1-gamma**upsample(steps, shape))/(1-gamma)
+
+def coarsening(n, min_size):
+    """ factor to coarsen a side of n cells by: the smallest divisor f of n-1 (so coarse cells sit exactly
+        on fine ones), or 1 when the coarse side (n-1)/f+1 would be smaller than min_size
+        (with n-1 prime it would collapse to 2 cells, useless as a warm start) """
+    factor = smallest_factor(n-1)
+    return factor if (n-1)//factor+1 >= min_size else 1
+
+def coarse_start(env, gamma, tol=VALUE_TOLERANCE, min_size=16):
+    """ initial values for a GridEnv from grids coarsened level by level (every f-th row / column, see
+        coarsening, no side below min_size): each level is solved to tol from the interpolated values of
+        the next coarser one. A grid none of whose sides can be coarsened (e.g. nrows-1 and ncols-1 prime)
+        gets zeros, i.e. no multigrid start """
+    if not hasattr(env, 'coarsen'): raise ValueError("multigrid start needs a GridEnv")
+    levels = [(env, 1, 1)]                      # (grid, row step, col step), step in fine moves
+    while True:
+        grid, row_step, col_step = levels[-1]
+        row_factor, col_factor = coarsening(grid.nrows, min_size), coarsening(grid.ncols, min_size)
+        if row_factor == col_factor == 1: break
+        levels.append((grid.coarsen(row_factor, col_factor), row_step*row_factor, col_step*col_factor))
+
+    values = None
+    for i in range(len(levels)-1, 0, -1):
+        grid, row_step, col_step = levels[i]
+        mdp = level_mdp(grid, gamma, row_step, col_step)
+        values = np.zeros(mdp.nstates) if values is None else values.reshape(-1)
+        values = sweep_until(mdp, 1.0, values, tol).reshape(mdp.shape)
+        fine_grid = levels[i-1][0]
+        values = refine(values, (fine_grid.nrows, fine_grid.ncols), gamma)
+        values[fine_grid.tabular()[2].reshape(values.shape)] = 0     # terminal states
+    return np.zeros((env.nrows, env.ncols)) if values is None else values
@@ -0,0 +1,113 @@
+import numpy as np
+
+from mdp import TabularMDP
+
+class Rollouts():
+    """ Monte Carlo evaluation of a policy: N agents stepped together through a GridEnv / TabularMDP,
+        actions and successors drawn by batched inverse-CDF sampling, each agent starting a new episode
+        as soon as its last one ends, return and episode-length statistics accumulated as episodes finish """
+
+    def __init__(self, env, policy, gamma=1, nagents=100000, max_steps=None, seed=None):
+        self.mdp = env if isinstance(env, TabularMDP) else TabularMDP.from_grid(env)
+        self.gamma = gamma
+        self.nagents = nagents
+        self.max_steps = max_steps      # episodes cut off after max_steps steps are counted as truncated
+        self.rng = np.random.default_rng(seed)
+        nstates, nactions = self.mdp.nstates, self.mdp.nactions
+        # action CDF per state, from probabilities (S, A) (e.g. solver.action_probabilities()),
+        # without its last column (the total, which draws are scaled to) and in float32 to halve the gathers
+        cdf = np.cumsum(np.asarray(policy, dtype=np.float64).reshape(nstates, nactions), axis=1)
+        self.cdf, self.totals = cdf[:, :-1].astype(np.float32), cdf[:, -1].astype(np.float32)
+        # successor CDF over all of P.data: row r spans (cumulative[indptr[r]-1], cumulative[indptr[r+1]-1]]
+        P = self.mdp.P
+        self.deterministic = np.all(np.diff(P.indptr) == 1)         # one successor per (s, a): no draw needed
+        self.cumulative = np.cumsum(P.data)
+        # GridEnv.reset: uniformly random non-terminal start
+        self.starts = np.flatnonzero(~self.mdp.terminal)
+
+    def actions(self, states):
+        """ one action per agent in states, drawn from the policy """
+        draws = self.rng.random(len(states), dtype=np.float32)*self.totals[states]
+        return np.sum(draws[:, None] >= self.cdf[states], axis=1)
+
+    def successors(self, rows):
+        """ one successor per (s, a) row of P """
+        P = self.mdp.P
+        if self.deterministic: return P.indices[P.indptr[rows]]
+        lo, hi = P.indptr[rows], P.indptr[rows+1]
+        base = np.where(lo > 0, self.cumulative[np.maximum(lo-1, 0)], 0.0)
+        draws = base+self.rng.random(len(rows))*(self.cumulative[hi-1]-base)
+        return P.indices[np.clip(np.searchsorted(self.cumulative, draws, side='right'), lo, hi-1)]
+
+    def stream(self, episodes, every=None, values=None):
+        """ run `episodes` episodes, yielding the statistics so far after every `every` finished episodes
+            (and at the end); with state values, the statistics also hold the mean predicted return of the
+            start states of the finished episodes, to compare with the sampled mean return """
+        stats = Statistics()
+        predicted = 0.0
+        nagents = min(self.nagents, episodes)
+        states = self.rng.choice(self.starts, nagents)
+        first = states.copy()
+        returns, discounts = np.zeros(nagents), np.ones(nagents)
+        lengths = np.zeros(nagents, dtype=np.int64)
+        started, report = nagents, every
+        while len(states):
+            actions = self.actions(states)
+            rows = states*self.mdp.nactions + actions
+            returns += discounts*self.mdp.rewards.reshape(-1)[rows]
+            discounts *= self.gamma
+            lengths += 1
+            states = self.successors(rows)
+            ended = self.mdp.terminal[states]
+            truncated = ~ended & (lengths >= self.max_steps) if self.max_steps is not None else np.zeros_like(ended)
+            done = np.flatnonzero(ended | truncated)
+            if not len(done): continue
+            stats.add(returns[done], lengths[done], np.count_nonzero(truncated[done]))
+            if values is not None: predicted += np.sum(values.reshape(-1)[first[done]])
+            # reset finished agents while episodes remain to be started, retire the others
+            restart = done[:max(min(len(done), episodes-started), 0)]
+            started += len(restart)
+            states[restart] = first[restart] = self.rng.choice(self.starts, len(restart))
+            returns[restart], discounts[restart], lengths[restart] = 0.0, 1.0, 0
+            if len(restart) < len(done):
+                keep = np.ones(len(states), dtype=bool)
+                keep[done[len(restart):]] = False
+                states, first, returns, discounts, lengths = states[keep], first[keep], returns[keep], discounts[keep], lengths[keep]
+            if every is not None and stats.count >= report and len(states):
+                report += every
+                yield stats.summary(predicted)
+        yield stats.summary(predicted)
+
+    def run(self, episodes, values=None):
+        """ run `episodes` episodes, returns their statistics """
+        for summary in self.stream(episodes, values=values): pass
+        return summary
+
+class Statistics():
+    """ streaming count, mean, variance (Chan et al. batch update), min and max of returns and episode lengths """
+
+    def __init__(self):
+        self.count, self.truncated = 0, 0
+        self.moments = {'return': [0.0, 0.0, np.inf, -np.inf], 'length': [0.0, 0.0, np.inf, -np.inf]}   # mean, M2, min, max
+
+    def add(self, returns, lengths, truncated=0):
+        n = len(returns)
+        for name, batch in (('return', returns), ('length', lengths)):
+            mean, m2, low, high = self.moments[name]
+            batch_mean = np.mean(batch)
+            delta = batch_mean-mean
+            total = self.count+n
+            self.moments[name] = [mean+delta*n/total, m2+np.sum((batch-batch_mean)**2)+delta**2*self.count*n/total,
+                                  min(low, np.min(batch)), max(high, np.max(batch))]
+        self.count += n
+        self.truncated += int(truncated)
+
+    def summary(self, predicted=0.0):
+        """ episodes, truncated, and mean / std / sem / min / max of return and length (plus predicted_return) """
+        summary = dict(episodes=self.count, truncated=self.truncated)
+        for name, (mean, m2, low, high) in self.moments.items():
+            std = np.sqrt(m2/max(self.count-1, 1))
+            summary.update({name+'_mean': float(mean), name+'_std': float(std), name+'_sem': float(std/np.sqrt(max(self.count, 1))),
+                            name+'_min': float(low), name+'_max': float(high)})
+        summary['predicted_return'] = float(predicted/max(self.count, 1))
+        return summary
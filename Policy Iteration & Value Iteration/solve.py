@@ -0,0 +1,104 @@
+import time
+import argparse
+import numpy as np
+
+from environment import GridEnv
+from PolicyIteration import PolicyIteration
+from ValueIteration import ValueIteration
+
+# name: (solver class, method)
+METHODS = {
+    'policy_iteration': (PolicyIteration, 'policy_iteration'),
+    'modified_policy_iteration': (PolicyIteration, 'modified_policy_iteration'),
+    'value_iteration': (ValueIteration, 'value_iteration'),
+    'prioritized_sweeping': (ValueIteration, 'prioritized_sweeping'),
+}
+# methods with a multigrid warm start and checkpoints
+MULTIGRID_METHODS = ('value_iteration', 'policy_iteration')
+
+def parse_cells(text):
+    """ cells 'x,y;x,y;...' as [(x, y), ...] """
+    return [tuple(int(v) for v in cell.split(',')) for cell in text.split(';') if cell]
+
+def make_solver(env, args):
+    cls, method = METHODS[args.method]
+    params = dict(evaluation=args.evaluation) if cls is PolicyIteration else dict()
+    return cls(env, args.gamma, compact=args.compact, **params), method
+
+def solve(solver, method, args):
+    """ run method on solver, return a short description of what it did """
+    if args.multigrid:
+        # warm start from coarser grids, then the plain solver (value / policy iteration only)
+        return ('%d sweeps' if method == 'value_iteration' else '%d iterations')%solver.multigrid_solve(tol=args.tol)
+    checkpoint = None
+    if args.checkpoint is not None:
+        from checkpoint import Checkpoint
+        checkpoint = Checkpoint(args.checkpoint)
+    if method == 'value_iteration': return '%d sweeps'%solver.value_iteration(tol=args.tol, checkpoint=checkpoint)
+    if method == 'policy_iteration': return '%d iterations'%solver.policy_iteration(checkpoint=checkpoint)
+    if method == 'modified_policy_iteration':
+        return '%d iterations'%len(solver.modified_policy_iteration(sweeps=args.sweeps, epsilon=args.tol))
+    return '%d backups'%solver.prioritized_sweeping(tol=args.tol)
+
+def save(solver, args):
+    """ write values and policy (as stored: probabilities, or a bitmask of greedy actions when compact) """
+    if args.output is not None:
+        np.savez(args.output, values=solver.values, policy=solver.policy, gamma=args.gamma, compact=args.compact)
+        print("[#] Values and policy written to %s."%args.output)
+    if args.values is not None:
+        np.save(args.values, solver.values)
+        print("[#] Values written to %s."%args.values)
+    if args.policy is not None:
+        np.save(args.policy, solver.policy)
+        print("[#] Policy written to %s."%args.policy)
+
+def plot(solver, path):
+    """ save an image of the values (matplotlib is only imported here) """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+    fig, ax = plt.subplots()
+    image = ax.imshow(solver.values, cmap='viridis')
+    fig.colorbar(image, ax=ax)
+    ax.set_title('values, γ=%g'%solver.gamma)
+    fig.savefig(path, dpi=150)
+    print("[#] Values plotted to %s."%path)
+
+def main(args):
+    env = GridEnv(args.nrows, args.ncols, goals=parse_cells(args.goals) if args.goals else None,
+                  blocked=parse_cells(args.blocked) if args.blocked else ())
+    solver, method = make_solver(env, args)
+    start = time.perf_counter()
+    done = solve(solver, method, args)
+    if not np.all(np.isfinite(solver.values)): raise SystemExit("[!] %s did not reach finite values."%args.method)
+    print("[#] %s on %dx%d Grid-World (γ=%g): %s in %.3f s."%(
+        args.method, args.nrows, args.ncols, args.gamma, done, time.perf_counter()-start))
+    save(solver, args)
+    if args.plot is not None: plot(solver, args.plot)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve a Grid-World with Policy Iteration or Value Iteration, without a display.')
+    parser.add_argument('nrows', type=int)
+    parser.add_argument('ncols', type=int)
+    parser.add_argument('--method', choices=list(METHODS), default='value_iteration')
+    parser.add_argument('--gamma', type=float, default=1.0, help='discount factor')
+    parser.add_argument('--tol', type=float, default=1e-9, help='stopping tolerance (value iteration, MPI, prioritized sweeping)')
+    parser.add_argument('--evaluation', choices=['sweep', 'direct', 'krylov', 'auto'], default='auto',
+                        help='policy evaluation of policy iteration')
+    parser.add_argument('--sweeps', type=int, default=10, help='evaluation sweeps per iteration of modified policy iteration')
+    parser.add_argument('--multigrid', action='store_true', help='warm start from coarser grids')
+    parser.add_argument('--compact', action='store_true', help='float32 values and a uint8 bitmask policy')
+    parser.add_argument('--goals', default=None, help="destinations 'x,y;x,y' (default: two corners)")
+    parser.add_argument('--blocked', default=None, help="blocked cells 'x,y;x,y'")
+    parser.add_argument('--checkpoint', default=None, help='checkpoint directory to resume from and save to')
+    parser.add_argument('--output', default='solution.npz', help='.npz of values and policy (empty: none)')
+    parser.add_argument('--values', default=None, help='.npy of values')
+    parser.add_argument('--policy', default=None, help='.npy of policy')
+    parser.add_argument('--plot', default=None, help='.png of values (imports matplotlib)')
+    args = parser.parse_args()
+    if not args.output: args.output = None
+    if args.multigrid and args.method not in MULTIGRID_METHODS:
+        parser.error("--multigrid works with --method %s"%' or '.join(MULTIGRID_METHODS))
+    if args.checkpoint is not None and (args.multigrid or args.method not in MULTIGRID_METHODS):
+        parser.error("--checkpoint works with --method %s, without --multigrid"%' or '.join(MULTIGRID_METHODS))
+    main(args)
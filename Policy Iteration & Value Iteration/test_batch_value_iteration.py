@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from environment import GridEnv
+from mdp import TabularMDP
+from BatchValueIteration import BatchValueIteration
+from ValueIteration import ValueIteration
+
+WALL = [(3, 0), (3, 1), (3, 2), (3, 3), (6, 4), (6, 5), (6, 6)]
+
+def assert_matches_separate_solves(batch, sweeps, models, gammas):
+    for b, (mdp, gamma) in enumerate(zip(models, gammas)):
+        VI = ValueIteration(mdp, gamma)
+        assert sweeps[b] == VI.value_iteration()
+        np.testing.assert_allclose(batch.values[b].reshape(-1), VI.values.reshape(-1), atol=1e-9)
+        np.testing.assert_array_equal(batch.policy[b].reshape(-1, batch.nactions) > 0, VI.action_probabilities() > 0)
+
+@pytest.mark.parametrize('slip', [0.0, 0.2])
+def test_discount_sweep_over_one_shared_model(slip):
+    mdp = TabularMDP.from_grid(GridEnv(8, 10, blocked=WALL), slip=slip)
+    gammas = [1.0, 0.99, 0.9, 0.5]
+    batch = BatchValueIteration(mdp, gammas)
+    assert batch.shared
+    sweeps = batch.value_iteration()
+    if slip: assert len(set(sweeps.tolist())) > 1  # the variants stop on their own convergence
+    assert_matches_separate_solves(batch, sweeps, [mdp]*len(gammas), gammas)
+
+def test_variants_with_their_own_goals():
+    envs = [GridEnv(8, 10, goals=goals, blocked=WALL) for goals in ([(0, 0)], [(9, 7)], [(5, 2), (0, 7)])]
+    models = [TabularMDP.from_grid(env, slip=0.1) for env in envs]
+    batch = BatchValueIteration(models, 0.95)
+    assert not batch.shared
+    sweeps = batch.value_iteration()
+    assert_matches_separate_solves(batch, sweeps, models, [0.95]*len(models))
+
+def test_variants_with_their_own_rewards():
+    grid = TabularMDP.from_grid(GridEnv(8, 10, blocked=WALL), slip=0.1)
+    models = [TabularMDP(grid.P, scale*grid.rewards, grid.terminal, shape=grid.shape) for scale in (1.0, 2.5, 0.1)]
+    batch = BatchValueIteration(models, [1.0, 0.9, 0.99])
+    assert batch.shared
+    sweeps = batch.value_iteration()
+    assert_matches_separate_solves(batch, sweeps, models, [1.0, 0.9, 0.99])
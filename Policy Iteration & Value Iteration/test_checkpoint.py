@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from environment import GridEnv
+from mdp import TabularMDP
+from checkpoint import Checkpoint
+from PolicyIteration import PolicyIteration
+from ValueIteration import ValueIteration
+
+class Interrupted(Exception):
+    pass
+
+class KilledCheckpoint(Checkpoint):
+    """ a checkpoint whose solve is killed after `after` iterations """
+
+    def __init__(self, directory, after, **kwargs):
+        super().__init__(directory, **kwargs)
+        self.after = after
+
+    def update(self, **progress):
+        super().update(**progress)
+        if self.count == self.after: raise Interrupted()
+
+def grid_mdp():
+    return TabularMDP.from_grid(GridEnv(9, 7, blocked=[(4, 1), (4, 2), (4, 3)]), slip=0.1)
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_value_iteration_resumes_from_checkpoint(tmp_path, compact):
+    VI = ValueIteration(grid_mdp(), 0.9, compact=compact)
+    sweeps = VI.value_iteration()
+    killed = ValueIteration(grid_mdp(), 0.9, compact=compact)
+    with pytest.raises(Interrupted):
+        killed.value_iteration(checkpoint=KilledCheckpoint(str(tmp_path), after=10, every=5))
+    resumed = ValueIteration(grid_mdp(), 0.9, compact=compact)
+    # killed right after a checkpoint: the resumed solve takes the remaining sweeps
+    assert resumed.value_iteration(checkpoint=Checkpoint(str(tmp_path), every=5)) == sweeps
+    np.testing.assert_array_equal(resumed.values, VI.values)
+    np.testing.assert_array_equal(resumed.policy, VI.policy)
+
+def test_value_iteration_resumes_between_checkpoints(tmp_path):
+    VI = ValueIteration(grid_mdp(), 0.9)
+    VI.value_iteration()
+    with pytest.raises(Interrupted):
+        ValueIteration(grid_mdp(), 0.9).value_iteration(checkpoint=KilledCheckpoint(str(tmp_path), after=7, every=5))
+    resumed = ValueIteration(grid_mdp(), 0.9)
+    resumed.value_iteration(checkpoint=Checkpoint(str(tmp_path), every=5))
+    np.testing.assert_allclose(resumed.values, VI.values, atol=1e-8)
+
+def test_policy_iteration_resumes_from_checkpoint(tmp_path):
+    PI = PolicyIteration(grid_mdp(), 0.9, evaluation='direct')
+    iterations = PI.policy_iteration()
+    with pytest.raises(Interrupted):
+        PolicyIteration(grid_mdp(), 0.9, evaluation='direct').policy_iteration(
+            checkpoint=KilledCheckpoint(str(tmp_path), after=2, every=1))
+    resumed = PolicyIteration(grid_mdp(), 0.9, evaluation='direct')
+    assert resumed.policy_iteration(checkpoint=Checkpoint(str(tmp_path))) == iterations
+    np.testing.assert_allclose(resumed.values, PI.values, atol=1e-9)
+    np.testing.assert_array_equal(resumed.policy, PI.policy)
+
+def test_checkpoint_of_another_solve_is_rejected(tmp_path):
+    ValueIteration(grid_mdp(), 0.9).value_iteration(checkpoint=Checkpoint(str(tmp_path)))
+    with pytest.raises(ValueError):
+        ValueIteration(grid_mdp(), 0.5).value_iteration(checkpoint=Checkpoint(str(tmp_path)))
+
+def test_checkpoint_of_another_model_is_rejected(tmp_path):
+    ValueIteration(grid_mdp(), 0.9).value_iteration(checkpoint=Checkpoint(str(tmp_path)))
+    other = TabularMDP.from_grid(GridEnv(9, 7, blocked=[(4, 1), (4, 2), (4, 4)]), slip=0.1)
+    with pytest.raises(ValueError):
+        ValueIteration(other, 0.9).value_iteration(checkpoint=Checkpoint(str(tmp_path)))
+    slippier = TabularMDP.from_grid(GridEnv(9, 7, blocked=[(4, 1), (4, 2), (4, 3)]), slip=0.2)
+    with pytest.raises(ValueError):
+        ValueIteration(slippier, 0.9).value_iteration(checkpoint=Checkpoint(str(tmp_path)))
@@ -0,0 +1,36 @@
+import numpy as np
+
+from environment import GridEnv
+
+def test_step_into_blocked_cell_stays_put():
+    env = GridEnv(4, 5, blocked=[(2, 1)])
+    env.pos = np.array([1, 1])
+    pos, reward, done = env.step(3)            # right, into (2, 1)
+    np.testing.assert_array_equal(pos, [1, 1])
+    np.testing.assert_array_equal(env.pos, [1, 1])
+    assert (reward, done) == (-1, False)
+
+def test_step_off_the_grid_stays_put():
+    env = GridEnv(4, 5)
+    for action, start in [(0, [2, 0]), (1, [2, 3]), (2, [0, 2]), (3, [4, 2])]:
+        env.pos = np.array(start)
+        pos, reward, done = env.step(action)
+        np.testing.assert_array_equal(env.pos, start)
+        assert (reward, done) == (-1, False)
+
+def test_step_moves_and_reaches_goal():
+    env = GridEnv(4, 5)
+    env.pos = np.array([1, 0])
+    pos, reward, done = env.step(2)            # left, onto the goal (0, 0)
+    np.testing.assert_array_equal(env.pos, [0, 0])
+    assert (reward, done) == (-1, True)
+
+def test_step_matches_tabular_model():
+    env = GridEnv(5, 6, blocked=[(2, 2), (3, 2)])
+    next_states, rewards, terminal = env.tabular()
+    for s in np.flatnonzero(~terminal):
+        for action in range(env.nactions):
+            env.pos = np.array([s%env.ncols, s//env.ncols])
+            pos, reward, done = env.step(action)
+            assert env.state_index(pos) == next_states[s, action]
+            assert reward == rewards[s, action]
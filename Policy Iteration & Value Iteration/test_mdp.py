@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+
+from environment import GridEnv
+from mdp import TabularMDP, pack_policy, unpack_policy
+from PolicyIteration import PolicyIteration
+from ValueIteration import ValueIteration
+
+def dense_value_iteration(env, gamma):
+    """ reference: the baseline in-place sweeps over GridEnv.transition, blocked cells absorbing like goals """
+    values = np.zeros((env.nrows, env.ncols))
+    delta = np.inf
+    while delta != 0:
+        delta = 0.0
+        for x, y in env.enumerate_state():
+            if env.isDone((x, y)) or env.blocked[y, x]: continue
+            action_values = []
+            for action in range(env.nactions):
+                (nx, ny), reward, done = env.transition(np.array([x, y]), action)
+                action_values.append(reward+gamma*values[ny, nx])
+            delta = max(delta, abs(max(action_values)-values[y, x]))
+            values[y, x] = max(action_values)
+    return values
+
+def greedy_sets(env, values, gamma):
+    greedy = np.zeros((env.nrows, env.ncols, env.nactions), dtype=bool)
+    for x, y in env.enumerate_state():
+        if env.isDone((x, y)) or env.blocked[y, x]: continue
+        action_values = np.array([reward+gamma*values[ny, nx] for (nx, ny), reward, done in
+                                  (env.transition(np.array([x, y]), action) for action in range(env.nactions))])
+        greedy[y, x] = action_values >= np.max(action_values)-1e-9
+    return greedy
+
+@pytest.fixture
+def env():
+    return GridEnv(7, 9, blocked=[(3, 1), (3, 2), (3, 3), (6, 5)])
+
+@pytest.mark.parametrize('gamma', [1.0, 0.9])
+def test_value_iteration_matches_dense_reference(env, gamma):
+    reference = dense_value_iteration(env, gamma)
+    VI = ValueIteration(env, gamma)
+    VI.value_iteration()
+    np.testing.assert_allclose(VI.values, reference, atol=1e-9)
+    np.testing.assert_array_equal(VI.policy > 0, greedy_sets(env, reference, gamma))
+
+@pytest.mark.parametrize('evaluation, atol', [('sweep', 1e-3), ('direct', 1e-9), ('krylov', 1e-6)])
+@pytest.mark.parametrize('gamma', [1.0, 0.9])
+def test_policy_iteration_matches_dense_reference(env, gamma, evaluation, atol):
+    reference = dense_value_iteration(env, gamma)
+    PI = PolicyIteration(env, gamma, evaluation=evaluation)
+    PI.policy_iteration()
+    np.testing.assert_allclose(PI.values, reference, atol=atol)
+    np.testing.assert_array_equal(PI.policy > 0, greedy_sets(env, reference, gamma))
+
+def random_mdp(nstates=12, nactions=3, seed=0):
+    rng = np.random.default_rng(seed)
+    P = rng.random((nstates*nactions, nstates))*(rng.random((nstates*nactions, nstates)) < 0.4)
+    P[np.arange(len(P)), rng.integers(nstates, size=len(P))] += 0.1
+    P /= P.sum(axis=1, keepdims=True)
+    rewards = rng.normal(size=(nstates, nactions))
+    terminal = np.zeros(nstates, dtype=bool)
+    terminal[0] = True
+    return P, rewards, terminal
+
+def test_stochastic_mdp_matches_dense_bellman_solution():
+    P, rewards, terminal = random_mdp()
+    gamma = 0.9
+    # dense value iteration to convergence
+    values = np.zeros(len(rewards))
+    for it in range(2000):
+        values = np.where(terminal, 0, np.max(rewards+gamma*(P @ values).reshape(rewards.shape), axis=1))
+    VI = ValueIteration(TabularMDP(P, rewards, terminal), gamma)
+    VI.value_iteration(tol=1e-12)
+    np.testing.assert_allclose(VI.values, values, atol=1e-9)
+    PI = PolicyIteration(TabularMDP(P, rewards, terminal), gamma, evaluation='direct')
+    PI.policy_iteration()
+    np.testing.assert_allclose(PI.values, values, atol=1e-9)
+
+def test_value_iteration_default_tolerance_terminates_on_stochastic_mdp():
+    P, rewards, terminal = random_mdp(seed=1)
+    VI = ValueIteration(TabularMDP(P, rewards, terminal), 0.999)
+    assert VI.value_iteration() < 100000
+
+def test_save_load_round_trip(tmp_path):
+    P, rewards, terminal = random_mdp()
+    mdp = TabularMDP(P, rewards, terminal, shape=(3, 4))
+    mdp.save(str(tmp_path/'mdp.npz'))
+    loaded = TabularMDP.load(str(tmp_path/'mdp.npz'))
+    assert loaded.shape == (3, 4)
+    np.testing.assert_array_equal(loaded.P.toarray(), mdp.P.toarray())
+    np.testing.assert_array_equal(loaded.rewards, mdp.rewards)
+    np.testing.assert_array_equal(loaded.terminal, mdp.terminal)
+
+@pytest.mark.parametrize('empty_rows', [[4], [5], [3, 4, 5], [0, 17]])
+def test_prioritized_sweeping_with_empty_rows_matches_value_iteration(empty_rows):
+    # an empty (s, a) row ends the episode after r(s, a): its backup is the reward alone
+    P, rewards, terminal = random_mdp(nstates=6, nactions=3, seed=2)
+    P[empty_rows] = 0
+    VI = ValueIteration(TabularMDP(P, rewards, terminal), 0.9)
+    VI.value_iteration(tol=1e-12)
+    PS = ValueIteration(TabularMDP(P, rewards, terminal), 0.9)
+    PS.prioritized_sweeping(tol=1e-12)
+    np.testing.assert_allclose(PS.values, VI.values, atol=1e-9)
+
+def test_pack_unpack_round_trip():
+    greedy = np.random.default_rng(3).random((5, 7, 8)) < 0.4
+    bits = pack_policy(greedy)
+    assert bits.dtype == np.uint8 and bits.shape == (5, 7)
+    probabilities = unpack_policy(bits, 8)
+    np.testing.assert_array_equal(probabilities > 0, greedy)
+    np.testing.assert_allclose(probabilities.sum(axis=-1), np.any(greedy, axis=-1))
+    np.testing.assert_array_equal(pack_policy(probabilities > 0), bits)
+
+def test_bitmask_policy_matrix_matches_probabilities():
+    P, rewards, terminal = random_mdp()
+    mdp = TabularMDP(P, rewards, terminal)
+    bits = pack_policy(np.random.default_rng(4).random(rewards.shape) < 0.5)
+    dense_P, dense_r = mdp.policy_matrix(unpack_policy(bits, rewards.shape[1]))
+    P_bits, r_bits = mdp.policy_matrix(bits)
+    np.testing.assert_allclose(P_bits.toarray(), dense_P.toarray())
+    np.testing.assert_allclose(r_bits, dense_r)
+
+@pytest.mark.parametrize('evaluation', ['sweep', 'direct', 'krylov', 'modified'])
+def test_compact_policy_iteration_matches_full(env, evaluation):
+    mdp = TabularMDP.from_grid(env, slip=0.1)
+    solvers = [PolicyIteration(mdp, 0.9, evaluation='sweep' if evaluation == 'modified' else evaluation,
+                               compact=compact) for compact in (False, True)]
+    for PI in solvers:
+        if evaluation == 'modified': PI.modified_policy_iteration()
+        else: PI.policy_iteration()
+    full, compact = solvers
+    assert compact.values.dtype == np.float32
+    np.testing.assert_allclose(compact.values, full.values, atol=1e-3)
+    np.testing.assert_array_equal(compact.action_probabilities() > 0, full.action_probabilities() > 0)
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_policy_iteration_terminates_at_the_tie_tolerance(compact):
+    # far from the goals the action values differ by about TIE_TOLERANCE, where greedy sets used to flip forever
+    env = GridEnv(64, 64)
+    VI = ValueIteration(env, 0.7)
+    VI.value_iteration()
+    PI = PolicyIteration(env, 0.7, evaluation='direct', compact=compact)
+    assert PI.policy_iteration() < 50
+    np.testing.assert_allclose(PI.values, VI.values, atol=1e-6)
+    MPI = PolicyIteration(env, 0.7, compact=compact)
+    assert len(MPI.modified_policy_iteration(epsilon=1e-9, max_iterations=300)) < 300
+    np.testing.assert_allclose(MPI.values, VI.values, atol=1e-6)
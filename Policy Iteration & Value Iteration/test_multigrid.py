@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from environment import GridEnv
+from multigrid import coarsening, coarse_start
+from PolicyIteration import PolicyIteration
+from ValueIteration import ValueIteration
+
+def test_coarsening_never_collapses_a_side():
+    assert coarsening(65, 16) == 2             # 64 = 2*32: 33 coarse cells
+    assert coarsening(54, 16) == 1             # 53 prime: would collapse to 2 cells
+    assert coarsening(25, 16) == 1             # 24 = 2*12: 13 coarse cells < 16
+
+def test_prime_grid_gets_no_multigrid_start():
+    np.testing.assert_array_equal(coarse_start(GridEnv(54, 48), 0.95), np.zeros((54, 48)))
+
+@pytest.mark.parametrize('shape', [(65, 49), (54, 65), (54, 48)])
+@pytest.mark.parametrize('gamma', [1.0, 0.95])
+def test_multigrid_solve_matches_value_iteration(shape, gamma):
+    env = GridEnv(*shape, blocked=[(5, y) for y in range(3, 20)])
+    VI = ValueIteration(env, gamma)
+    VI.value_iteration()
+    MG = ValueIteration(env, gamma)
+    MG.multigrid_solve()
+    np.testing.assert_allclose(MG.values, VI.values, atol=1e-6)
+    np.testing.assert_array_equal(MG.policy > 0, VI.policy > 0)
+
+@pytest.mark.parametrize('evaluation', ['direct', 'krylov', 'sweep'])
+@pytest.mark.parametrize('compact', [False, True])
+def test_policy_iteration_multigrid_solve_through_a_thin_wall(evaluation, compact):
+    # a wall one cell thin vanishes on the coarse grids: at γ=1 their greedy policy walks into it forever
+    env = GridEnv(65, 65, blocked=[(32, y) for y in range(60)])
+    VI = ValueIteration(env, 1.0)
+    VI.value_iteration()
+    MG = PolicyIteration(env, 1.0, evaluation=evaluation, compact=compact)
+    MG.multigrid_solve()
+    assert np.all(np.isfinite(MG.values))
+    np.testing.assert_allclose(MG.values, VI.values, atol=1e-6)
+    np.testing.assert_array_equal(MG.action_probabilities() > 0, VI.action_probabilities() > 0)
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from environment import GridEnv
+from mdp import TabularMDP
+from ValueIteration import ValueIteration
+from ParallelValueIteration import ParallelValueIteration
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('compact', [False, True])
+def test_parallel_matches_serial(workers, compact):
+    env = GridEnv(13, 11, blocked=[(4, 2), (4, 3), (4, 4)])
+    mdp = TabularMDP.from_grid(env, slip=0.1)
+    VI = ValueIteration(mdp, 0.95, compact=compact)
+    sweeps = VI.value_iteration()
+    PVI = ParallelValueIteration(mdp, 0.95, workers=workers, tiles=5, compact=compact)
+    assert PVI.value_iteration() == sweeps
+    assert PVI.values.dtype == VI.values.dtype
+    np.testing.assert_array_equal(PVI.values, VI.values)
+    np.testing.assert_array_equal(PVI.policy, VI.policy)
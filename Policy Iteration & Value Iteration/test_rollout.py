@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from environment import GridEnv
+from mdp import TabularMDP
+from rollout import Rollouts
+from ValueIteration import ValueIteration
+
+WALL = [(3, 1), (3, 2), (3, 3), (3, 4)]
+
+def solved(mdp, gamma):
+    VI = ValueIteration(mdp, gamma)
+    VI.value_iteration()
+    return VI
+
+def test_sampled_return_on_a_deterministic_grid_is_the_value_of_the_start():
+    VI = solved(TabularMDP.from_grid(GridEnv(6, 7, blocked=WALL)), 1)
+    summary = Rollouts(VI.mdp, VI.action_probabilities(), 1, nagents=500, seed=0).run(4000, values=VI.values)
+    assert summary['episodes'] == 4000 and summary['truncated'] == 0
+    # every greedy path from a start has the same return: the optimal value of the start
+    assert summary['return_mean'] == pytest.approx(summary['predicted_return'], abs=1e-9)
+    assert summary['return_min'] >= np.min(VI.values) and summary['return_max'] <= -1
+
+@pytest.mark.parametrize('gamma', [1.0, 0.95])
+def test_sampled_return_on_a_slippery_grid_matches_the_values(gamma):
+    VI = solved(TabularMDP.from_grid(GridEnv(6, 7, blocked=WALL), slip=0.3), gamma)
+    summary = Rollouts(VI.mdp, VI.action_probabilities(), gamma, nagents=2000, seed=1).run(40000, values=VI.values)
+    assert summary['episodes'] == 40000
+    # within 5 standard errors of the mean predicted return of the starts drawn, and of the mean value of all starts
+    assert abs(summary['return_mean']-summary['predicted_return']) < 5*summary['return_sem']
+    starts = VI.values.reshape(-1)[~VI.mdp.terminal]
+    assert abs(summary['predicted_return']-np.mean(starts)) < 5*np.std(starts)/np.sqrt(summary['episodes'])
+
+def test_max_steps_truncates_episodes():
+    env = GridEnv(5, 6)
+    # always left: only the top row reaches the goal (0, 0), every other start walks into the left edge for good
+    policy = np.zeros((env.nrows*env.ncols, env.nactions))
+    policy[:, 2] = 1
+    summary = Rollouts(env, policy, 1, nagents=100, max_steps=7, seed=2).run(1000)
+    assert summary['episodes'] == 1000
+    assert 0 < summary['truncated'] < 1000
+    assert summary['length_max'] == 7 and summary['return_min'] == -7
+    top = 5/(env.nrows*env.ncols-2)             # starts in the top row, out of the non-terminal ones
+    assert summary['truncated']/1000 == pytest.approx(1-top, abs=0.05)
@@ -0,0 +1,53 @@
+import copy
+import numpy as np
+import pytest
+
+from environment import GridEnv
+from mdp import TabularMDP
+from PolicyIteration import PolicyIteration
+from ValueIteration import ValueIteration
+
+WALL = [(4, y) for y in range(1, 7)]
+
+# edits applied one after another: (method name, arguments)
+EDITS = [
+    ('set_blocked', ([(4, 7), (5, 3)],)),                  # extend the wall and block a cell next to it
+    ('set_blocked', ([(4, 3), (4, 4)], False)),            # open a gap in the wall
+    ('set_goals', ([(0, 0), (8, 5)],)),                    # move a goal to the far side of the wall
+    ('set_blocked', ([(7, 5), (8, 4)],)),                  # block cells next to the new goal
+    ('set_blocked', ([(5, 3), (4, 7)], False)),            # unblock cells next to the wall
+    ('set_goals', ([(10, 8)],)),                           # one goal, in a corner
+]
+
+def fresh_solution(env, gamma):
+    VI = ValueIteration(copy.deepcopy(env), gamma)
+    VI.value_iteration()
+    return VI
+
+@pytest.mark.parametrize('solver', [ValueIteration, PolicyIteration])
+@pytest.mark.parametrize('gamma', [1.0, 0.9])
+def test_update_cells_matches_fresh_solve_after_each_edit(solver, gamma):
+    env = GridEnv(9, 11, blocked=WALL)
+    params = dict(evaluation='direct') if solver is PolicyIteration else dict()
+    incremental = solver(env, gamma, **params)
+    incremental.value_iteration() if solver is ValueIteration else incremental.policy_iteration()
+    for method, args in EDITS:
+        cells = getattr(env, method)(*args)
+        incremental.update_cells(cells)
+        fresh = fresh_solution(env, gamma)
+        np.testing.assert_allclose(incremental.values, fresh.values, atol=1e-6, err_msg='%s%s'%(method, args))
+        np.testing.assert_array_equal(incremental.action_probabilities() > 0, fresh.action_probabilities() > 0,
+                                      err_msg='%s%s'%(method, args))
+
+@pytest.mark.parametrize('gamma', [1.0, 0.9])
+def test_update_grid_of_a_slippery_model_matches_fresh_solve(gamma):
+    env = GridEnv(9, 11, blocked=WALL)
+    mdp = TabularMDP.from_grid(env, slip=0.2)
+    values = np.zeros(mdp.shape)
+    mdp.prioritized_sweeping(values, gamma, 1e-12)
+    for method, args in EDITS:
+        cells = getattr(env, method)(*args)
+        mdp.update_grid(env, cells, values, gamma, tol=1e-12)
+        fresh = ValueIteration(TabularMDP.from_grid(copy.deepcopy(env), slip=0.2), gamma)
+        fresh.value_iteration(tol=1e-12)
+        np.testing.assert_allclose(values.reshape(-1), fresh.values.reshape(-1), atol=1e-6, err_msg='%s%s'%(method, args))